@@ -0,0 +1,82 @@
+__author__ = 'Jonas'
+# The fixed corpus of terminal inputs, the translator and the string utilities are benchmarked with. All the inputs are
+# generated deterministically, so that the results of different runs can be compared with each other
+
+
+# The commands known to the command reference of the benchmarks, a few real ones and a lot of generic ones
+COMMAND_DICT = {"print": "print", "help": "help", "env_vars": "env_var", "restart": "restart"}
+for _index in range(50):
+    COMMAND_DICT["cmd{}".format(_index)] = "mod{}".format(_index)
+
+
+def get_short_commands():
+    """
+    A line of the short commands, that are typically entered into the console
+    :return: (string)
+    """
+    return "help(); env_vars('test'); print($x); $y = 3; !cmd1($y)"
+
+
+def get_nested_calls(depth=8):
+    """
+    A single command call, whose parameter is a command call, whose parameter is a command call... up to the given depth
+    Notes:
+        - The recursive '_find_whole_commands' function takes exponential time in the nesting depth, a depth of 10
+          already takes seconds per call, which is why the default depth is kept at 8
+    :param depth: (int) the amount of nested command calls
+    :return: (string)
+    """
+    opening = ''.join("cmd{}(1, ".format(index % 50) for index in range(depth))
+    return ''.join([opening, "$x", ")" * depth])
+
+
+def get_heavy_quoting(amount=40):
+    """
+    A line of command calls with parameters in single, double and triple quotes, that contain brackets, dollar signs and
+    the other quotation marks
+    :param amount: (int) the amount of command calls
+    :return: (string)
+    """
+    call_list = []
+    for index in range(amount):
+        call_list.append("cmd{}('a($b)', \"c'd)\", '''e\"f'(g''', \"\"\"h'i\"$j\"\"\")".format(index % 50))
+    return " and ".join(call_list)
+
+
+def get_many_variables(amount=200):
+    """
+    A line, that adds up a lot of different environmental variables
+    :param amount: (int) the amount of variables
+    :return: (string)
+    """
+    return "$result = " + " + ".join("$var{}".format(index) for index in range(amount))
+
+
+def get_pasted_script(lines=1000):
+    """
+    A multi line script, as it would be pasted into the console, mixing assignments, command calls, loops and strings
+    :param lines: (int) the amount of lines
+    :return: (string)
+    """
+    line_formats = ["$var{0} = cmd{1}({0}, 'text {0}')",
+                    "for i in range($var{0}):",
+                    "    print(cmd{1}(i, $var{0}))",
+                    "if $var{0} > 3: !cmd{1}(\"background {0}\")",
+                    "# a comment mentioning cmd{1}() and $var{0}",
+                    "x = len('''multi ' line''') + {0}"]
+    line_list = []
+    for index in range(lines):
+        line_list.append(line_formats[index % len(line_formats)].format(index, index % 50))
+    return "\n".join(line_list)
+
+
+def get_corpus():
+    """
+    The whole corpus of the benchmarks
+    :return: (dict) the names of the inputs as keys to the input strings
+    """
+    return {"short": get_short_commands(),
+            "nested": get_nested_calls(),
+            "quoting": get_heavy_quoting(),
+            "variables": get_many_variables(),
+            "script": get_pasted_script()}
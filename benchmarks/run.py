@@ -0,0 +1,150 @@
+__author__ = 'Jonas'
+# The runner of the benchmarks for the translator and the string utilities, that are part of the interactive latency of
+# every command. Every benchmark function is timed with every input of the corpus.
+#
+# USAGE (from the directory containing the JTSv2 package):
+# python -m JTSv2.benchmarks.run --save baseline.json
+# python -m JTSv2.benchmarks.run --compare baseline.json --threshold 0.2
+import JTSv2.benchmarks.corpus as corpus
+import JTSv2.translate as translate
+import JTSv2.lib.stringutil as stringops
+import statistics
+import argparse
+import platform
+import json
+import time
+import sys
+
+
+class _CommandReference:
+    """
+    The command reference of the benchmarks, only offering the dictionary of the command names to module names, that
+    is used by the translation, without reading the config or the command directory
+    """
+    def __init__(self, command_dict):
+        self.dict = command_dict
+
+
+COMMAND_REFERENCE = _CommandReference(corpus.COMMAND_DICT)
+
+# The names of the benchmarks and the functions, that are called with the input string as the only argument
+BENCHMARKS = [("translate", lambda string: translate.translate(string, COMMAND_REFERENCE)),
+              ("find_whole_commands", translate._find_whole_commands),
+              ("find_environmental_variables", translate._find_environmental_variables),
+              ("translate_environmental_variables", translate._translate_environmental_variables),
+              ("split_string_structures", stringops.split_string_structures),
+              ("replace_ignore_in_quotationmarks",
+               lambda string: stringops.replace_ignore_in_quotationmarks(string, "$var1", "EnV['var1']"))]
+
+
+def measure(function, argument, min_time=0.2, min_runs=5, max_runs=100000):
+    """
+    Calls the function with the argument repeatedly, timing every single call, until the calls took at least the
+    minimum time and the minimum amount of runs has been reached
+    :param function: (callable) the function to be benchmarked
+    :param argument: (any) the argument to call the function with
+    :param min_time: (float) the minimum time in seconds, the measurement should take
+    :param min_runs: (int) the minimum amount of calls
+    :param max_runs: (int) the maximum amount of calls
+    :return: (dict) the amount of runs, the operations per second and the 50th, 95th and 99th percentile of the call
+    duration in seconds
+    """
+    timings = []
+    total_time = 0
+    while (total_time < min_time or len(timings) < min_runs) and len(timings) < max_runs:
+        start = time.perf_counter()
+        function(argument)
+        duration = time.perf_counter() - start
+        timings.append(duration)
+        total_time += duration
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return {"runs": len(timings),
+            "ops_per_sec": len(timings) / total_time,
+            "p50": percentiles[49],
+            "p95": percentiles[94],
+            "p99": percentiles[98]}
+
+
+def run_benchmarks(name_filter="", min_time=0.2):
+    """
+    Runs every benchmark with every input of the corpus, printing a line with the results for each of them
+    :param name_filter: (string) only the benchmarks, whose name contains this string are run. Empty on default
+    :param min_time: (float) the minimum time in seconds, each single measurement should take
+    :return: (dict) the names of the benchmarks in the format 'function:input' as keys to the measurement results
+    """
+    results = {}
+    corpus_dict = corpus.get_corpus()
+    print("{:<50}{:>14}{:>12}{:>12}{:>12}".format("benchmark", "ops/sec", "p50 (us)", "p95 (us)", "p99 (us)"))
+    for function_name, function in BENCHMARKS:
+        for input_name, input_string in corpus_dict.items():
+            benchmark_name = "{}:{}".format(function_name, input_name)
+            if name_filter not in benchmark_name:
+                continue
+            result = measure(function, input_string, min_time)
+            results[benchmark_name] = result
+            print("{:<50}{:>14.1f}{:>12.1f}{:>12.1f}{:>12.1f}".format(benchmark_name, result["ops_per_sec"],
+                                                                      result["p50"] * 1e6, result["p95"] * 1e6,
+                                                                      result["p99"] * 1e6), flush=True)
+    return results
+
+
+def save_baseline(results, file_path):
+    """
+    Saves the results of a benchmark run as JSON file, so it can be used as the baseline of later runs
+    :param results: (dict) the results as returned by 'run_benchmarks'
+    :param file_path: (string) the path of the JSON file
+    :return: (void)
+    """
+    with open(file_path, "w") as file:
+        json.dump({"python": platform.python_version(), "results": results}, file, indent=4, sort_keys=True)
+
+
+def compare_baseline(results, file_path, threshold):
+    """
+    Compares the results of a benchmark run with the saved baseline, every benchmark, whose operations per second
+    decreased by more than the threshold is considered a regression
+    :param results: (dict) the results as returned by 'run_benchmarks'
+    :param file_path: (string) the path of the JSON file of the baseline
+    :param threshold: (float) the tolerated relative slow down, 0.2 meaning 20 percent less operations per second
+    :return: (list) the strings describing the regressions
+    """
+    with open(file_path, "r") as file:
+        baseline = json.load(file)["results"]
+
+    regression_list = []
+    for benchmark_name, result in results.items():
+        if benchmark_name not in baseline:
+            continue
+        baseline_ops = baseline[benchmark_name]["ops_per_sec"]
+        change = result["ops_per_sec"] / baseline_ops - 1
+        if change < -threshold:
+            regression_list.append("{}: {:.1f} ops/sec instead of {:.1f} ({:+.1%})".format(
+                benchmark_name, result["ops_per_sec"], baseline_ops, change))
+    return regression_list
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the translator and the string utilities")
+    parser.add_argument("--filter", default="", help="only run the benchmarks containing this string")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per measurement")
+    parser.add_argument("--save", metavar="PATH", help="save the results as the baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with the baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated relative slow down (0.2 = 20%%)")
+    arguments = parser.parse_args(arguments)
+
+    results = run_benchmarks(arguments.filter, arguments.min_time)
+
+    if arguments.save:
+        save_baseline(results, arguments.save)
+    if arguments.compare:
+        regression_list = compare_baseline(results, arguments.compare, arguments.threshold)
+        if len(regression_list) != 0:
+            print("\nREGRESSIONS")
+            print("\n".join(regression_list))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
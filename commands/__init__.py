@@ -1 +1,54 @@
 __author__ = 'Jonas'
+import types
+import os
+# The package of the command modules. Additional command directories are appended to the search path of the package, so
+# that the modules within them can be imported as 'JTSv2.commands.<name>', just like the modules of this directory.
+
+
+def extend_path(directories):
+    """
+    Appends the given directories to the search path of the package, in case they are not already part of it. As the
+    directories are searched in order, the modules of the earlier directories take precedence over modules with the same
+    name in later directories.
+    Args:
+        directories: The list of the paths of the command directories
+
+    Returns:
+    void
+    """
+    for directory in directories:
+        directory = os.path.abspath(directory)
+        if directory not in __path__:
+            __path__.append(directory)
+
+
+def find_module_bindings(namespace):
+    """
+    Finds the names within the namespace, that are bound to the command modules of the same name, as done by the import
+    statements of the translation ('import JTSv2.commands.<name> as <name>') and by the injection of the modules
+    Args:
+        namespace: The dict of the globals of an execution
+
+    Returns:
+    The set of those names
+    """
+    prefix = __name__ + "."
+    return {name for name, value in list(namespace.items())
+            if isinstance(value, types.ModuleType) and value.__name__ == prefix + name}
+
+
+def remove_module_bindings(namespace, kept_names=frozenset()):
+    """
+    Removes the names bound to the command modules from the namespace after an execution, so that a namespace, which is
+    kept from one input to the next, does not keep the modules, hiding the builtins and the names of the user, that
+    have the same names as the commands (as for example 'print' or 'help')
+    Args:
+        namespace: The dict of the globals of the execution
+        kept_names: The set of the names, that have already been bound before the execution, by an execution, that is
+            still running, as for example the command running a script within the same namespace
+
+    Returns:
+    void
+    """
+    for name in find_module_bindings(namespace) - kept_names:
+        namespace.pop(name, None)
@@ -0,0 +1,18 @@
+import os
+
+
+def main(shell, file_path):
+    """
+    This command runs a whole script file, which is written in the shell language, as one single input: The content of
+    the file is translated once, compiled once and executed within the shell, that called the command, so that the
+    messages of the script are displayed as they are produced, just like those of any other command.
+    Args:
+        shell: -
+        file_path: The string path of the script file, relative paths starting at the project directory
+
+    Returns:
+    void
+    """
+    if not os.path.isabs(file_path):
+        file_path = os.path.join(shell.project_path, file_path)
+    shell.run_script(file_path)
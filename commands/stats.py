@@ -0,0 +1,34 @@
+import time
+
+import JTSv2.lib.timingutil as timingutil
+
+
+def main(shell, amount=5):
+    """
+    This command displays where the recent inputs of the shell spent their time: For every stage of the path of an
+    input through the shell (waiting in the input queue, translation, compilation, execution, relaying the remaining
+    messages and the total time within the shell) the 50th, 95th and 99th percentile of the duration is printed,
+    followed by the slowest of the recent inputs.
+    Args:
+        shell: -
+        amount: The amount of the slowest inputs to be displayed. Default is 5
+
+    Returns:
+    void
+    """
+    latency_recorder = shell.get_latency_recorder()
+    string_list = ["Stage durations of the last {} inputs (ms):\n".format(len(latency_recorder)),
+                   "{:<12}{:>8}{:>10}{:>10}{:>10}\n".format("stage", "count", "p50", "p95", "p99")]
+    for stage, percentile_dict in latency_recorder.percentiles().items():
+        string_list.append("{:<12}{:>8}{:>10.2f}{:>10.2f}{:>10.2f}\n".format(
+            stage, percentile_dict["count"], percentile_dict["p50"] * 1000, percentile_dict["p95"] * 1000,
+            percentile_dict["p99"] * 1000))
+
+    string_list.append("\nSlowest inputs (ms):\n")
+    for record_time, input_string, timings in latency_recorder.slowest(amount):
+        stage_string = ", ".join("{} {:.2f}".format(stage, timings[stage] * 1000)
+                                 for stage in timingutil.STAGES if stage in timings and stage != timingutil.STAGE_TOTAL)
+        string_list.append("{} {:>10.2f}  {!r} ({})\n".format(time.strftime("%H:%M:%S", time.localtime(record_time)),
+                                                               timings.get(timingutil.STAGE_TOTAL, 0) * 1000,
+                                                               input_string, stage_string))
+    shell.print_result(''.join(string_list))
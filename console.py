@@ -2,11 +2,12 @@ __author__ = 'Jonas'
 import JTSv2.lib.kivyutil as kivyutil
 kivyutil.init_kivy()
 from JTSv2.ui.consolewidget import SimpleConsoleWidget
-from JTSv2.datamanage import ResultMessage
+from JTSv2.datamanage import ResultMessage, UserInput
 from kivy.clock import Clock
 from kivy.app import App
 
 import inspect
+import time
 import os
 
 
@@ -32,7 +33,7 @@ class ShellConsoleWidget(SimpleConsoleWidget):
         super(ShellConsoleWidget, self).on_text_validate(*args)
         if not self.output_window.input_prompt_issued():
             self.new_command(self.input_line.get_input())
-        self.output_queue.put(self.input_line.get_input())
+        self.output_queue.put(UserInput(self.input_line.get_input(), time.time()))
 
 
 class ConsoleApp(App):
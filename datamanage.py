@@ -331,6 +331,46 @@ class DataRequest:
         self.function_keyword_arguments = kwargs
 
 
+class UserInput:
+    """
+    The input of the user, as it is sent from the ui to the shell, together with the time it has been entered, so that
+    the shell can measure how long the input has been waiting in its input queue. The shells also accept plain strings
+    as input, for which the waiting time is unknown.
+
+    :ivar string: (string) The entered code or the response to an input prompt
+
+    :ivar timestamp: (float) The time the input has been entered, as returned by 'time.time'
+
+    :ivar timeout: (float) The time in seconds, after which the command of the input is cancelled. None on default, in
+    which case the timeout configured for the shell applies
+    """
+    def __init__(self, string, timestamp, timeout=None):
+        self.string = string
+        self.timestamp = timestamp
+        self.timeout = timeout
+
+
+class CancelRequest:
+    """
+    The request of the ui to cancel the foreground commands of a shell, which is sent through the input queue of the
+    shell just like any other input. A running command is interrupted by the CommandCancelled exception, a command,
+    that has not been started yet, is not executed at all.
+
+    :ivar command_id: (int) The id of the command to be cancelled. None on default, in which case all the commands of
+    the shell, that have not finished yet, are cancelled
+    """
+    def __init__(self, command_id=None):
+        self.command_id = command_id
+
+
+class CommandCancelled(BaseException):
+    """
+    The exception, that interrupts a foreground command, that has been cancelled by the ui or exceeded its timeout. It
+    is derived from BaseException, so that a command catching every Exception still gets interrupted
+    """
+    pass
+
+
 class ShellCom:
     """
     The ShellCom base class for the process to shell communication. An instance of such an object HAS to be passed to
@@ -529,12 +569,21 @@ class ForegroundShellCom(ShellCom):
     def print_result(self, string):
         self._print(ResultMessage(string))
 
-    def prompt_input(self, prompt):
-        self._print(InputPromptMessage(prompt))
-        return self.shell.get_input()
+    def prompt_input(self, prompt, timeout=None, data_type=None):
+        self.shell.check_cancelled()
+        return self.shell.prompt_input(prompt, timeout, data_type)
+
+    def run_script(self, file_path):
+        self.shell.execute_script(file_path)
+
+    def get_latency_recorder(self):
+        return self.shell.latency_recorder
 
     def _print(self, msg):
-        self.shell.print_q.put(msg)
+        # every message of a cancelled command is a chance to stop it, even if it is blocked within a C function, that
+        # is not interrupted by the asynchronous exception
+        self.shell.check_cancelled()
+        self.shell.put_message(msg)
 
 
 class BackgroundShellCom(ShellCom):
@@ -577,8 +626,12 @@ class Message:
 
         :ivar color: (string) the name of a color (that has to exist in the internal color dictionary), in which the message
         should appear, if possible in the corresponding ui environment
+
+        :ivar command_id: (int) the id of the command of the shell, that issued the message, so that the ui can group
+        the messages of commands running at the same time. None for messages, that do not belong to a command
         """
         self.content = string
+        self.command_id = None
 
         # adding the brackets to the prefix strings
         self.prefix = self._add_prefix_brackets(prefix)
@@ -2,39 +2,94 @@ __author__ = 'Jonas'
 import pickle
 import numpy as np
 import inspect
+import types
+import time
 import os
 import JTSv2.datamanage as datamanage
 import JTSv2.process as process
+import JTSv2.lib.cacheutil as cacheutil
+import JTSv2.lib.timingutil as timingutil
+import JTSv2.commands as commands
 
 PROGRAM = "program"
 COMMAND = "command"
 
+# The cache of the compiled code objects, shared by all the shells and the start of the background processes
+CODE_CACHE = cacheutil.CodeCache(256)
+
 
 # TODO: Create naming algorithm processes
-def execute(shell, translated_string):
+def execute(shell, translated_string, timings=None, use_cache=True):
     """
     When given the shell and the already translated string of the code to be executed, this function provides the
     namespace containing the variables, having exactly those names, that have been assumed by the translation process
     and then dynamically executes the code within translated_string, using the python interpreter itself
     :param shell: (Shell) The reference to the shell instance, that issued the execute function
-    :param translated_string: (string) The already translated string, containing only pure valid python expressions/
-    statements
+    :param translated_string: (string/code/tuple) The already translated string, containing only pure valid python
+    expressions/statements, or the code object, that has already been compiled by the translation. In case the shell
+    injects the command modules, the tuple of the translation and the names of the modules to be injected
+    :param timings: (dict) the dict, into which the durations of the 'compile' and the 'exec' stage are written in
+    seconds. None on default, in which case nothing is measured
+    :param use_cache: (boolean) whether the compiled code is taken from/ put into the code cache. True on default,
+    large inputs like whole scripts are compiled without the cache, so that they do not evict the other entries
     :return: (void)
     """
-    # ALL VARIABLE NAMES ARE IMPORTANT AS TEY ARE PART OF THE TRANSLATION PROCESS AND HAVE TO BE CHANGED THERE AS WELL
     print(translated_string)
-    # creating the foreground ShellCom interface for execution
-    fg_com = datamanage.ForegroundShellCom(shell.shell_server, shell)
-
-    # shortening the name of the environmental variable container, as the term 'EnV' is used within the translated
-    # string to be dynamically executed, therefore the variable container has to be available in this local namespace
-    EnV = shell.env_variable_container
-    process_list = shell.process_list
+    # The globals of the execution are kept by the shell from one input to the next, so that the ordinary python names,
+    # that have been assigned by the user, stay defined without going through the environmental variables
+    namespace = shell.namespace if shell.persistent_namespace else create_namespace(shell)
+    fg_com = shell.fg_com
+    # The names assumed by the translation are set again for every execution, in case the user has assigned them
+    namespace.update(shell=shell, fg_com=fg_com, EnV=shell.env_variable_container, process_list=shell.process_list)
+    module_names = ()
+    if shell.inject_modules:
+        translated_string, module_names = translated_string
+    # The command modules bound by this execution are removed at its end, so they do not hide the builtins of the same
+    # names within the following inputs, the ones of an enclosing execution running a script are kept
+    bound_names = commands.find_module_bindings(namespace)
     try:
-        compiled_input = compile(translated_string, '<string>', 'exec')
-        exec(compiled_input)
+        # the translation into a syntax tree already delivers the compiled code object
+        if isinstance(translated_string, types.CodeType):
+            compiled_input = translated_string
+        else:
+            start = time.perf_counter()
+            if use_cache:
+                compiled_input = CODE_CACHE.compile(translated_string)
+            else:
+                compiled_input = compile(translated_string, '<string>', 'exec')
+            if timings is not None:
+                timings[timingutil.STAGE_COMPILE] = time.perf_counter() - start
+
+        if len(module_names) != 0:
+            # The translation did not add any import statements, instead the modules of the commands, that have been
+            # translated into calls of their main functions, are put into the namespace of the execution directly
+            command_reference_dictionary = shell.shell_server.command_reference_dictionary
+            namespace.update(command_reference_dictionary.resolve_modules(module_names))
+        start = time.perf_counter()
+        try:
+            exec(compiled_input, namespace)
+        finally:
+            if timings is not None:
+                timings[timingutil.STAGE_EXEC] = time.perf_counter() - start
     except Exception as e:
         fg_com.print_error(e)
+    finally:
+        commands.remove_module_bindings(namespace, bound_names)
+
+
+def create_namespace(shell):
+    """
+    Creates the globals dict for the executions of the given shell, containing everything the translated code assumes
+    to exist: the functions of this module (as for example 'background'), the shell, its foreground ShellCom 'fg_com',
+    the environmental variable container 'EnV' and the process list
+    ALL VARIABLE NAMES ARE IMPORTANT AS THEY ARE PART OF THE TRANSLATION PROCESS AND HAVE TO BE CHANGED THERE AS WELL
+    :param shell: (Shell) the shell, whose inputs are executed within the namespace
+    :return: (dict) the namespace
+    """
+    namespace = dict(globals())
+    namespace.update(shell=shell, fg_com=shell.fg_com, EnV=shell.env_variable_container,
+                     process_list=shell.process_list)
+    return namespace
 
 
 # TODO: make it return subprocess alive, add a method for checking to the ProcessList
@@ -49,7 +104,12 @@ def background(shell, execution_statement):
     statements
     :return: (void)
     """
-    shell.process_list.start_process(execution_statement, shell.shell_server.data_nexus)
+    # compiling the statement in this process already, so that starting the same background command multiple times
+    # only compiles it once. The process inherits the compiled code object
+    CODE_CACHE.compile(execution_statement)
+    # the process also needs the search path of the command modules, as it might not inherit the state of this process
+    shell.process_list.start_process(execution_statement, shell.shell_server.data_nexus,
+                                     CODE_CACHE.export([execution_statement]), list(commands.__path__))
 
 
 
@@ -0,0 +1,354 @@
+__author__ = 'Jonas'
+import collections
+import threading
+import marshal
+import queue
+import hashlib
+import os
+
+
+class LRUCache:
+    """
+    A size bounded, thread safe dictionary like cache, that evicts the least recently used entries as soon as the
+    maximum size is exceeded. The cache keeps track of how often a lookup has been successful, how often it missed and
+    how many entries have been evicted, so the size of the cache can be chosen based on those numbers.
+
+    :ivar max_size: (int) The maximum amount of entries in the cache
+
+    :ivar hits: (int) The amount of successful lookups
+
+    :ivar misses: (int) The amount of lookups for keys, that were not in the cache
+
+    :ivar evictions: (int) The amount of entries, that had to be removed because the cache was full
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._dict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Gets the value to the given key and marks the entry as the most recently used one
+        Args:
+            key: The key of the entry
+            default: The value to be returned in case there is no entry for the key
+
+        Returns:
+        The value of the entry or the default value
+        """
+        with self._lock:
+            if key in self._dict:
+                self._dict.move_to_end(key)
+                self.hits += 1
+                return self._dict[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Adds the entry to the cache, evicting the least recently used entries in case the cache is full
+        Args:
+            key: The key of the entry
+            value: The value of the entry
+
+        Returns:
+        void
+        """
+        with self._lock:
+            self._dict[key] = value
+            self._dict.move_to_end(key)
+            while len(self._dict) > self.max_size:
+                self._dict.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries from the cache, the counters keep their values
+        Returns:
+        void
+        """
+        with self._lock:
+            self._dict.clear()
+
+    def statistics(self):
+        """
+        The current size and the counters of the cache
+        Returns:
+        A dict with the keys 'size', 'max_size', 'hits', 'misses' and 'evictions'
+        """
+        with self._lock:
+            return {"size": len(self._dict),
+                    "max_size": self.max_size,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __contains__(self, key):
+        return key in self._dict
+
+
+class CodeCache(LRUCache):
+    """
+    The LRU cache of compiled code objects, using the python source code, they were compiled from, as the key, so that
+    the same source code is only compiled once, as long as it stays in the cache.
+    As code objects can not be pickled, the entries of the cache can be exported as marshalled byte strings, which can
+    be passed to a subprocess, so that it can start with a warmed cache.
+    """
+    def __init__(self, max_size=256):
+        super(CodeCache, self).__init__(max_size)
+
+    def compile(self, source):
+        """
+        Returns the compiled code object of the given source code from the cache, compiling and adding it in case it
+        is not yet in there
+        Args:
+            source: The string of the python code to be compiled in the 'exec' mode
+
+        Returns:
+        The code object
+        """
+        code = self.get(source)
+        if code is None:
+            code = compile(source, '<string>', 'exec')
+            self.put(source, code)
+        return code
+
+    def export(self, sources=None):
+        """
+        Exports the entries of the cache as marshalled byte strings
+        Args:
+            sources: The list of source strings, whose entries are to be exported. None on default, in which case all
+                entries are exported
+
+        Returns:
+        The dict with the source strings as keys and the byte strings of the marshalled code objects as values
+        """
+        with self._lock:
+            if sources is None:
+                sources = list(self._dict.keys())
+            return {source: marshal.dumps(self._dict[source]) for source in sources if source in self._dict}
+
+    def update(self, exported):
+        """
+        Adds the entries, that have been exported by the 'export' method of another cache
+        Args:
+            exported: The dict with the source strings and the byte strings of the marshalled code objects
+
+        Returns:
+        void
+        """
+        for source, code_bytes in exported.items():
+            self.put(source, marshal.loads(code_bytes))
+
+
+class DiskCache:
+    """
+    The persistent cache of values, that can be marshalled (strings, code objects and tuples of those), within a
+    directory, similar to the '__pycache__' directories of python. Every entry is a single file named by its key, which
+    is written completely before it replaces an existing file, so that concurrent readers never see a half written
+    entry. Reading an entry updates the modification time of its file, so that the least recently used entries are the
+    ones being removed by 'prune'.
+    The entries are written by a background thread, so that adding an entry does not wait for the file system. Until
+    an entry has been written, it is served from memory. As soon as the writes exceed the maximum amount of entries,
+    the least recently used entries are removed, leaving some room, so that the directory is not scanned with every
+    single write.
+    Any failure of reading or writing an entry is treated like a cache miss, the cache is never supposed to break the
+    actual work.
+
+    :ivar directory: (string) the path of the directory containing the entry files
+
+    :ivar max_entries: (int) the maximum amount of entries
+
+    :ivar hits: (int) The amount of successful lookups
+
+    :ivar misses: (int) The amount of lookups for keys, that were not in the cache
+    """
+    EXTENSION = ".jtsc"
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+        # The entries, that have not been written yet, and the keys to be written by the writer thread in order
+        self._pending_dict = {}
+        self._write_queue = queue.Queue()
+        self._writer = None
+        # The amount of entry files, as counted by the last prune plus the new files written since, None until the
+        # first prune
+        self._entry_count = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Creates the key of an entry as the hash of the given parts
+        Args:
+            *parts: The strings and other objects with a stable representation, that identify the entry
+
+        Returns:
+        The hexadecimal string of the hash
+        """
+        return hashlib.sha256(repr(parts).encode("utf-8", "surrogatepass")).hexdigest()
+
+    def get(self, key, default=None):
+        """
+        Gets the value of the entry with the given key
+        Args:
+            key: The key of the entry as created by 'make_key'
+            default: The value to be returned in case there is no valid entry for the key
+
+        Returns:
+        The value of the entry or the default value
+        """
+        with self._lock:
+            if key in self._pending_dict:
+                self.hits += 1
+                return self._pending_dict[key]
+
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as file:
+                value = marshal.load(file)
+            os.utime(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Adds the entry, which is written into its file by the writer thread
+        Args:
+            key: The key of the entry as created by 'make_key'
+            value: The marshallable value of the entry
+
+        Returns:
+        void
+        """
+        with self._lock:
+            self._pending_dict[key] = value
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_entries, name="DiskCacheWriter", daemon=True)
+                self._writer.start()
+        self._write_queue.put(key)
+
+    def flush(self):
+        """
+        Waits until all the added entries have been written
+        Returns:
+        void
+        """
+        self._write_queue.join()
+
+    def prune(self, max_entries=None):
+        """
+        Removes the least recently used entries, so that there are no more than the maximum amount of entries left
+        Args:
+            max_entries: The amount of entries to be kept. None on default, in which case it is the maximum amount of
+                entries of the cache
+
+        Returns:
+        The amount of removed entries
+        """
+        if max_entries is None:
+            max_entries = self.max_entries
+        entry_list = []
+        try:
+            for directory_entry in os.scandir(self.directory):
+                if directory_entry.name.endswith(self.EXTENSION):
+                    entry_list.append((directory_entry.stat().st_mtime_ns, directory_entry.path))
+        except OSError:
+            return 0
+
+        entry_list.sort(reverse=True)
+        removed = 0
+        for _, path in entry_list[max_entries:]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._entry_count = len(entry_list) - removed
+        return removed
+
+    def statistics(self):
+        """
+        The counters of the cache
+        Returns:
+        A dict with the keys 'max_entries', 'hits' and 'misses'
+        """
+        with self._lock:
+            return {"max_entries": self.max_entries,
+                    "hits": self.hits,
+                    "misses": self.misses}
+
+    def _write_entries(self):
+        """
+        The main loop of the writer thread, writing the added entries one after another
+        Returns:
+        void
+        """
+        while True:
+            key = self._write_queue.get()
+            try:
+                with self._lock:
+                    # an entry, that has been added multiple times, is only written once with its latest value
+                    if key not in self._pending_dict:
+                        continue
+                    value = self._pending_dict[key]
+                self._write(key, value)
+                with self._lock:
+                    if self._pending_dict.get(key) is value:
+                        del self._pending_dict[key]
+            finally:
+                self._write_queue.task_done()
+
+    def _write(self, key, value):
+        """
+        Writes the entry into its file, removing the least recently used entries in case there are too many
+        Args:
+            key: The key of the entry
+            value: The marshallable value of the entry
+
+        Returns:
+        void
+        """
+        path = self._get_path(key)
+        is_new = not os.path.exists(path)
+        temporary_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(temporary_path, "wb") as file:
+                marshal.dump(value, file)
+            os.replace(temporary_path, path)
+        except (OSError, ValueError):
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._entry_count is not None and is_new:
+                self._entry_count += 1
+            entry_count = self._entry_count
+        if entry_count is None:
+            self.prune()
+        elif entry_count > self.max_entries:
+            self.prune(self.max_entries - self.max_entries // 10)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + self.EXTENSION)
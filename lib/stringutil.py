@@ -233,6 +233,8 @@ def split_string_structures(string):
     A function that splits the given string to separate regular text from python string structures within the
     mainstring. string structures meaning everything that is encapsulated by a pair of matching quotation marks, that
     are valid options to define a python string ("example", 'example', '''example'''...).
+    The substrings are sliced from the spans found by 'get_string_spans', functions, that only have to inspect the
+    string, should use those spans directly instead of the copied substrings.
 
     EXAMPLE:
     "this is a 'demonstration' of functionality"
@@ -241,50 +243,7 @@ def split_string_structures(string):
     :param string: (string) the string that is assumed to inherit quotation marks and is supposed to be split
     :returns: (list) list of separated strings
     """
-    # The string is split into a list, slicing at every quotationmark, so that the substrings within quotationmarks
-    # are being separated from the other parts of the string. Strings in between
-    string_list = []
-
-    # first checking and then filtering the strings with three quotation marks
-    if string.count("'''") > 1 or string.count('"""') > 1:
-        # don't even try to understand it took you way tooo long to come up with it
-        reg = re.compile("""'''[^']*'''|'''[^'"]*['"]{1,2}[^'"]*'''|"{3}[^"]"{3}|"{3}[^'"]*['"]{1,2}[^'"]*"{3}""")
-        last_index = 0
-        for m in re.finditer(reg, string):
-            string_list.append(string[last_index:m.start()])
-            string_list.append(string[m.start():m.end()])
-            last_index = m.end()
-        string_list.append(string[last_index:len(string)])
-
-        # now, that there no more triple quotes to interfere, going through the string list and looking for single
-        # quotes within the strings, that weren't already classified as python string structures
-
-        _string_list = string_list
-        string_list = []
-
-        for obj in _string_list:
-            if not((obj[0] == "'" or obj[0]=='"') and (obj[-1] == "'" or obj[-1] == '"')):
-                reg = re.compile("""'[^']*'|"[^"]*"{1}""")
-                last_index = 0
-                for m in re.finditer(reg, obj):
-                    string_list.append(obj[last_index:m.start()])
-                    string_list.append(obj[m.start():m.end()])
-                    last_index = m.end()
-                string_list.append(obj[last_index:len(obj)])
-            else:
-                string_list.append(obj)
-
-    # In case there are no triple quotation marks, checking for the single ones
-    else:
-        reg = re.compile("""'[^']*'|"[^"]*"{1}""")
-        last_index = 0
-        for m in re.finditer(reg, string):
-            string_list.append(string[last_index:m.start()])
-            string_list.append(string[m.start():m.end()])
-            last_index = m.end()
-        string_list.append(string[last_index:len(string)])
-
-    return string_list
+    return [string[start:end] for start, end, is_quoted in get_string_spans(string)]
 
 
 def replace_ignore_in_quotationmarks(mainstring, substring, replacement):
@@ -292,6 +251,8 @@ def replace_ignore_in_quotationmarks(mainstring, substring, replacement):
     A function that is similar to the regular string.replace(), except it won't affect any python string structure
     within the main string. string structures meaning everything that is encapsulated by a pair of matching quotation
     marks, that are valid options to define a python string ("example", 'example', '''example'''...).
+    Only the string structures, that contain the substring themselves are being protected, so that a substring, that
+    encloses a whole string structure, as for example a function call with a string parameter, is replaced as well.
 
     EXAMPLE:
     replace_ignore_in_quotationmarks("This is a demo 'a demo this is'", "demo", "X")
@@ -313,56 +274,164 @@ def replace_ignore_in_quotationmarks(mainstring, substring, replacement):
         if mainstring.count('"') < 2:
             return mainstring.replace(substring, replacement)
 
-    # Since it is very likely, that at this point there is a string in there, the procedure will be as follows:
-    # calling the split_string_structures function on the mainstring, which will return a list, that split at the
-    # assumed python string structures (meaning everything that is enclosed by a pair of quotation marks)
+    # The replacement is only applied to the regions in between the string structures, that contain the substring, as
+    # all other string structures can be treated just like regular text. The search within the spans is done on the
+    # main string itself, so the only substrings being copied are the regions, that are actually being replaced
+    string_list = []
+    last_index = 0
+    for start, end, is_quoted in get_string_spans(mainstring):
+        if is_quoted and mainstring.find(substring, start, end) != -1:
+            string_list.append(mainstring[last_index:start].replace(substring, replacement))
+            string_list.append(mainstring[start:end])
+            last_index = end
+    string_list.append(mainstring[last_index:].replace(substring, replacement))
 
-    string_list = split_string_structures(mainstring)
+    return ''.join(string_list)
 
-    # At this point of the function the string list is a list containing regular text and the quotation strings, the
-    # replacement function will now only be used in the regular text, thus not affecting anything, that is encapsulated
-    # by quotes
 
-    appended_string_list = []
-    temporary_string_list = []
+def replace_multiple_ignore_in_quotationmarks(mainstring, replacement_dict):
+    """
+    A function that works just like 'replace_ignore_in_quotationmarks', but applies multiple replacements within one
+    single pass over the main string, instead of splitting and joining the whole string again for every replacement.
+    In case multiple substrings match at the same position, the longest one is replaced. Just like with the single
+    replacement, only the string structures, that contain any of the substrings themselves are being protected.
+    As the main string is only scanned once, a replacement can never be affected by the result of another one.
 
-    for string in string_list:
-        if not(len(string) == 0):
-            if (string[0] == "'" or string[0] == '"') and (string[-1] == "'" or string[-1] == '"'):
-                if substring not in string:
-                    temporary_string_list.append(string)
-                else:
-                    temporary_string = ''.join(temporary_string_list)
-                    appended_string_list.append(temporary_string)
-                    temporary_string_list = []
-                    appended_string_list.append(string)
-            else:
-                temporary_string_list.append(string)
+    EXAMPLE:
+    replace_multiple_ignore_in_quotationmarks("$a + $ab + '$a'", {"$a": "A", "$ab": "AB"})
+    > "A + AB + '$a'"
 
-    if len(temporary_string_list) != 0:
-        temporary_string = ''.join(temporary_string_list)
-        appended_string_list.append(temporary_string)
+    :param mainstring: (string) the mainstring to manipulate
+    :param replacement_dict: (dict) the substrings to be replaced as keys to their replacement strings
+    :return: (string)
+    """
+    if len(replacement_dict) == 0:
+        return mainstring
 
-    final_string_list = []
+    # The alternatives of a regex are tried from left to right, so sorting the substrings by their length makes the
+    # pattern match the longest substring at every position
+    substring_list = sorted(replacement_dict.keys(), key=len, reverse=True)
+    pattern = re.compile("|".join(map(re.escape, substring_list)))
 
-    for string in appended_string_list:
-        if not(len(string) == 0):
-            if not((string[0] == "'" or string[0] == '"') and (string[-1] == "'" or string[-1] == '"')):
-                final_string_list.append(string.replace(substring, replacement))
-            else:
-                final_string_list.append(string)
+    # the regions in between the protected string structures, in which the replacements are made
+    region_list = []
+    last_index = 0
+    for start, end, is_quoted in get_string_spans(mainstring):
+        if is_quoted and pattern.search(mainstring, start, end) is not None:
+            region_list.append((last_index, start))
+            last_index = end
+    region_list.append((last_index, len(mainstring)))
+
+    string_list = []
+    position = 0
+    for region_start, region_end in region_list:
+        # the protected string structure in front of the region
+        string_list.append(mainstring[position:region_start])
+        position = region_start
+        for match in pattern.finditer(mainstring, region_start, region_end):
+            string_list.append(mainstring[position:match.start()])
+            string_list.append(replacement_dict[match.group()])
+            position = match.end()
+        string_list.append(mainstring[position:region_end])
+        position = region_end
 
-    return ''.join(final_string_list)
+    return ''.join(string_list)
 
 
 def count_ignore_in_quotationmarks(string, substring):
     combined_count = 0
 
-    string_list = split_string_structures(string)
+    for start, end, is_quoted in get_string_spans(string):
+        if not is_quoted:
+            combined_count += string.count(substring, start, end)
 
-    for string in string_list:
-        if not(len(string) == 0):
-            if not((string[0] == "'" or string[0] == '"') and (string[-1] == "'" or string[-1] == '"')):
-                combined_count += string.count(substring)
+    return combined_count
 
-    return combined_count
\ No newline at end of file
+
+# the pattern, that finds the next quotation mark, which could open a python string structure
+_QUOTATION_MARK_PATTERN = re.compile(r"""['"]""")
+
+# the patterns, that find the next character of interest within a python string structure, which is either an escaping
+# backslash, the quotation mark, which could be the closing one, or a line break, that ends a unterminated single line
+# string. Indexed by the quotation mark, that opened the string structure
+_STRING_END_PATTERNS = {"'": re.compile(r"""[\\'\n]"""),
+                        '"': re.compile(r"""[\\"\n]""")}
+
+
+def find_string_end(string, index):
+    """
+    If given a string and the index of a quotation mark within that string, that is assumed to open a python string
+    structure, this function will return the index just after the quotation marks, that close the string structure.
+    Triple quotation marks and escaped quotation marks (preceded by a backslash) are being respected, whereas single
+    quoted string structures also end at the end of the line.
+
+    EXAMPLE:
+    find_string_end("a = 'it\\'s' + b", 4)
+    > 11
+
+    :param string: (string) the main string, that contains the string structure
+    :param index: (int) the index of the opening quotation mark
+    :return: (int) the index after the closing quotation marks or -1 in case the string structure is not terminated
+    """
+    quotation_mark = string[index]
+    delimiter = quotation_mark * 3 if string.startswith(quotation_mark * 3, index) else quotation_mark
+    pattern = _STRING_END_PATTERNS[quotation_mark]
+
+    position = index + len(delimiter)
+    while True:
+        match = pattern.search(string, position)
+        if match is None:
+            return -1
+        position = match.start()
+        character = string[position]
+        if character == "\\":
+            # skipping the escaped character, whatever it is
+            position += 2
+        elif character == "\n":
+            if len(delimiter) == 1:
+                return -1
+            position += 1
+        elif string.startswith(delimiter, position):
+            return position + len(delimiter)
+        else:
+            position += 1
+
+
+def get_string_spans(string):
+    """
+    Scans the given string once and returns the spans of the regular text and the python string structures within the
+    string, as tuples of the start index, the end index (exclusive) and whether the span is a string structure. The
+    spans are in order and cover the whole string, empty spans are left out.
+    The string structures are found by 'find_string_end', so triple quotation marks and escaped quotation marks are
+    being respected. Quotation marks, that do not open a terminated string structure, are considered regular text. The
+    prefixes of raw, byte and format strings are part of the regular text, as they do not change where a string
+    structure ends.
+
+    EXAMPLE:
+    get_string_spans("print('a' + b)")
+    > [(0, 6, False), (6, 9, True), (9, 14, False)]
+
+    :param string: (string) the string that is assumed to inherit quotation marks
+    :return: (list) list of the (start, end, is_quoted) tuples
+    """
+    span_list = []
+    last_index = 0
+    position = 0
+    while True:
+        match = _QUOTATION_MARK_PATTERN.search(string, position)
+        if match is None:
+            break
+        start = match.start()
+        end = find_string_end(string, start)
+        if end == -1:
+            position = start + 1
+            continue
+
+        if start != last_index:
+            span_list.append((last_index, start, False))
+        span_list.append((start, end, True))
+        last_index = position = end
+
+    if last_index != len(string):
+        span_list.append((last_index, len(string), False))
+    return span_list
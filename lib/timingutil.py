@@ -0,0 +1,108 @@
+__author__ = 'Jonas'
+import collections
+import threading
+import time
+
+# The stages of the path of a single input through the shell, in the order they are passed
+STAGE_QUEUE = "queue"
+STAGE_TRANSLATE = "translate"
+STAGE_COMPILE = "compile"
+STAGE_EXEC = "exec"
+STAGE_RELAY = "relay"
+STAGE_TOTAL = "total"
+STAGES = (STAGE_QUEUE, STAGE_TRANSLATE, STAGE_COMPILE, STAGE_EXEC, STAGE_RELAY, STAGE_TOTAL)
+
+
+class LatencyRecorder:
+    """
+    The fixed size ring buffer of the durations of the stages of the recently processed inputs of a shell. Recording an
+    input is only appending a tuple to a bounded deque, so that the recorder can be left on all the time, the
+    percentiles are only computed when they are actually requested.
+
+    :ivar max_entries: (int) The amount of the most recent inputs, whose timings are kept
+
+    :ivar count: (int) The amount of inputs, that have been recorded in total
+    """
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.count = 0
+
+        self._records = collections.deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, input_string, timings):
+        """
+        Adds the timings of a processed input, replacing the oldest record in case the buffer is full
+        Args:
+            input_string: The string of the input, as it has been entered
+            timings: The dict with the names of the stages as keys and their durations in seconds as values, the
+                stages, that did not take place for the input, are simply left out
+
+        Returns:
+        void
+        """
+        with self._lock:
+            self._records.append((time.time(), input_string, timings))
+            self.count += 1
+
+    def percentiles(self):
+        """
+        Computes the 50th, 95th and 99th percentile of the duration of every stage over the recorded inputs
+        Returns:
+        The dict with the names of the stages as keys and dicts with the keys 'count', 'p50', 'p95' and 'p99' as
+        values, the durations being in seconds. Stages without any recorded duration are left out
+        """
+        with self._lock:
+            records = list(self._records)
+
+        percentile_dict = {}
+        for stage in STAGES:
+            durations = sorted(timings[stage] for _, _, timings in records if stage in timings)
+            if len(durations) == 0:
+                continue
+            percentile_dict[stage] = {"count": len(durations),
+                                      "p50": _get_percentile(durations, 50),
+                                      "p95": _get_percentile(durations, 95),
+                                      "p99": _get_percentile(durations, 99)}
+        return percentile_dict
+
+    def slowest(self, amount=5):
+        """
+        Returns the recorded inputs with the longest total duration
+        Args:
+            amount: The amount of inputs to be returned
+
+        Returns:
+        The list of tuples of the time the input has been recorded (as returned by 'time.time'), the input string and
+        the dict of its timings, the slowest input coming first
+        """
+        with self._lock:
+            records = list(self._records)
+        records.sort(key=lambda record: record[2].get(STAGE_TOTAL, 0), reverse=True)
+        return records[:amount]
+
+    def clear(self):
+        """
+        Removes all the records, the count of the recorded inputs keeps its value
+        Returns:
+        void
+        """
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+
+def _get_percentile(sorted_values, percent):
+    """
+    The nearest rank percentile of the already sorted list of values
+    Args:
+        sorted_values: The non empty list of values in ascending order
+        percent: The percentile between 0 and 100
+
+    Returns:
+    The value at the percentile
+    """
+    rank = -(-percent * len(sorted_values) // 100)
+    return sorted_values[max(rank, 1) - 1]
@@ -0,0 +1,190 @@
+__author__ = 'Jonas'
+import ctypes.util
+import threading
+import traceback
+import ctypes
+import select
+import struct
+import time
+import os
+
+# The flags of the inotify events, that indicate, that a file within the watched directory has been written, created,
+# moved or deleted (see 'man inotify')
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# The header of every inotify event: the watch descriptor, the mask, the cookie and the length of the name
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class DirectoryWatcher(threading.Thread):
+    """
+    The Thread, that watches a directory for changed files and calls the callback with the names of all the files,
+    that have been changed, created or deleted. On Linux the kernels inotify interface is used via ctypes, so that the
+    thread is only woken up by actual changes, on every other system (or in case inotify is not available) the
+    directory is polled in the given interval instead.
+    As editors tend to write a file in multiple steps, the changes are collected until there are no more changes for the
+    duration of the settle time, so that the callback is called only once with all of them.
+
+    :ivar directory: (string) the path of the watched directory
+
+    :ivar callback: (callable) the function, that is called with the set of the names of the changed files
+
+    :ivar interval: (float) the polling interval in seconds, also the longest time it takes the thread to stop
+
+    :ivar settle_time: (float) the time in seconds without any changes, after which the callback is called
+
+    :ivar extensions: (tuple) only changes of files with these extensions are being reported
+
+    :ivar error_callback: (callable) the function, that is called with the exception, in case the callback raises one.
+    None on default, in which case the traceback is printed. Either way the thread keeps watching the directory
+
+    :ivar use_inotify: (boolean) whether the thread uses inotify or is polling the directory
+    """
+    def __init__(self, directory, callback, interval=1.0, settle_time=0.1, extensions=(".py",), error_callback=None):
+        super(DirectoryWatcher, self).__init__(daemon=True)
+        self.directory = directory
+        self.callback = callback
+        self.interval = interval
+        self.settle_time = settle_time
+        self.extensions = extensions
+        self.error_callback = error_callback
+
+        self.running = True
+        self.use_inotify = False
+        self._file_descriptor = None
+        self._libc = None
+        if hasattr(os, "uname") and os.uname().sysname == "Linux":
+            self._init_inotify()
+        # The state of the directory is taken right away, so that the polling does not miss the changes, which happen
+        # before the thread is started, just like the inotify watch, which is added right away as well
+        self._snapshot = self._get_snapshot()
+
+    def _init_inotify(self):
+        """
+        Creates the inotify instance and adds the watch for the directory, in case anything fails the thread will fall
+        back to polling
+        :return: (void)
+        """
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            file_descriptor = self._libc.inotify_init1(IN_NONBLOCK)
+            if file_descriptor < 0:
+                return
+            if self._libc.inotify_add_watch(file_descriptor, os.fsencode(self.directory), WATCH_MASK) < 0:
+                os.close(file_descriptor)
+                return
+        except (OSError, AttributeError):
+            return
+        self._file_descriptor = file_descriptor
+        self.use_inotify = True
+
+    def run(self):
+        """
+        The main loop of the watcher, waiting for changes until the thread is stopped
+        :return: (void)
+        """
+        try:
+            if self.use_inotify:
+                self._run_inotify()
+            else:
+                self._run_polling()
+        finally:
+            if self._file_descriptor is not None:
+                os.close(self._file_descriptor)
+                self._file_descriptor = None
+
+    def stop(self):
+        """
+        Stops the watcher, which will happen within the time of the interval at the latest
+        :return: (void)
+        """
+        self.running = False
+
+    def _run_inotify(self):
+        """
+        Waits for the inotify events of the directory, collecting the file names until the changes have settled
+        :return: (void)
+        """
+        changed_names = set()
+        while self.running:
+            timeout = self.settle_time if len(changed_names) != 0 else self.interval
+            readable, _, _ = select.select([self._file_descriptor], [], [], timeout)
+            if len(readable) == 0:
+                if len(changed_names) != 0:
+                    self._report(changed_names)
+                    changed_names = set()
+                continue
+
+            try:
+                data = os.read(self._file_descriptor, 64 * 1024)
+            except BlockingIOError:
+                continue
+            position = 0
+            while position + EVENT_HEADER.size <= len(data):
+                _, _, _, name_length = EVENT_HEADER.unpack_from(data, position)
+                position += EVENT_HEADER.size
+                name = os.fsdecode(data[position:position + name_length].rstrip(b"\0"))
+                position += name_length
+                changed_names.add(name)
+
+    def _run_polling(self):
+        """
+        Compares the modification times and sizes of the files in the directory in every interval
+        :return: (void)
+        """
+        snapshot = self._snapshot
+        while self.running:
+            time.sleep(self.interval)
+            new_snapshot = self._get_snapshot()
+            if new_snapshot == snapshot:
+                continue
+
+            # waiting until the files are not being written anymore
+            while self.running:
+                time.sleep(self.settle_time)
+                settled_snapshot = self._get_snapshot()
+                if settled_snapshot == new_snapshot:
+                    break
+                new_snapshot = settled_snapshot
+            changed_names = {name for name in set(snapshot) | set(new_snapshot)
+                             if snapshot.get(name) != new_snapshot.get(name)}
+            snapshot = new_snapshot
+            self._report(changed_names)
+
+    def _get_snapshot(self):
+        """
+        :return: (dict) the file names in the directory as keys to tuples of their modification time and size
+        """
+        snapshot = {}
+        try:
+            for directory_entry in os.scandir(self.directory):
+                if directory_entry.is_file():
+                    stat = directory_entry.stat()
+                    snapshot[directory_entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+        return snapshot
+
+    def _report(self, changed_names):
+        """
+        Calls the callback with those of the changed file names, that have one of the watched extensions. An exception
+        of the callback is reported instead of ending the thread, so the following changes are still being watched
+        :param changed_names: (set) the names of the changed files
+        :return: (void)
+        """
+        changed_names = {name for name in changed_names if name.endswith(self.extensions)}
+        if len(changed_names) == 0:
+            return
+        try:
+            self.callback(changed_names)
+        except Exception as exception:
+            if self.error_callback is not None:
+                self.error_callback(exception)
+            else:
+                traceback.print_exc()
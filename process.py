@@ -2,23 +2,38 @@ __author__ = 'Jonas'
 import threading
 import multiprocessing
 import JTSv2.datamanage as datamanage
+import JTSv2.lib.cacheutil as cacheutil
+import JTSv2.commands as commands
 import time
 
 
-def _execute_background(bg_com, translated_string):
-
-    compiled_input = compile(translated_string, '<string>', 'exec')
+def _execute_background(bg_com, translated_string, warm_cache=None, command_path=None):
+    """
+    The target function of the background processes, dynamically executing the translated string
+    :param bg_com: (BackgroundShellCom) the ShellCom object of the background process
+    :param translated_string: (string) the translated python code to execute
+    :param warm_cache: (dict) the exported entries of the code cache of the starting process, None on default
+    :param command_path: (list) the search path of the command modules of the starting process, None on default
+    :return: (void)
+    """
+    if command_path is not None:
+        commands.extend_path(command_path)
+    code_cache = cacheutil.CodeCache()
+    if warm_cache is not None:
+        code_cache.update(warm_cache)
+    compiled_input = code_cache.compile(translated_string)
     exec(compiled_input)
 
 
 class Process:
 
-    def __init__(self, execution_statement, data_nexus):
+    def __init__(self, execution_statement, data_nexus, warm_cache=None, command_path=None):
         # initializing the super class
 
         self.output_queue = multiprocessing.Queue()
         self.com = datamanage.BackgroundShellCom(data_nexus, self.output_queue)
-        self.process = multiprocessing.Process(target=_execute_background, args=(self.com, execution_statement,))
+        self.process = multiprocessing.Process(target=_execute_background, args=(self.com, execution_statement,
+                                                                                 warm_cache, command_path,))
         self.process.start()
 
     def get_exitcode(self):
@@ -54,10 +69,11 @@ class ProcessList(threading.Thread):
             time.sleep(0.001)
             if len(self.process_starting_request) != 0:
                 request_list = self.process_starting_request.pop(0)
-                self.append(request_list[0], Process(request_list[1], request_list[2]))
+                self.append(request_list[0], Process(request_list[1], request_list[2], request_list[3],
+                                                     request_list[4]))
 
-    def start_process(self, execution_statement, data_nexus):
-        self.process_starting_request.append(["Process", execution_statement, data_nexus])
+    def start_process(self, execution_statement, data_nexus, warm_cache=None, command_path=None):
+        self.process_starting_request.append(["Process", execution_statement, data_nexus, warm_cache, command_path])
 
     def process_objects(self):
         """
@@ -3,11 +3,20 @@ import JTSv2.datamanage as datamanage
 import JTSv2.translate as translate
 import JTSv2.execute as execute
 import JTSv2.process as process
+import JTSv2.worker as worker
+import JTSv2.lib.watchutil as watchutil
+import JTSv2.lib.cacheutil as cacheutil
+import JTSv2.lib.timingutil as timingutil
+import concurrent.futures
 import importlib.machinery
 import multiprocessing
 import configparser
+import collections
 import threading
+import itertools
 import inspect
+import ctypes
+import heapq
 import queue
 import time
 import sys
@@ -33,6 +42,8 @@ class ShellServer(threading.Thread):
     :ivar command_reference_dictionary: (CommandReferenceDictionary) The Dictionary containing the command references,
     specifically assigning the usable command names to the corresponding module names of the 'commands' folder
 
+    :ivar translation_cache: (TranslationCache) The cache of the recently translated inputs, shared by all shells
+
     :ivar process_list: (ProcessList) A Thread, managing the starting and garbage collection of running and terminated
     background commands or program connections
 
@@ -43,6 +54,9 @@ class ShellServer(threading.Thread):
 
     :ivar data_nexus: (DataNexus) The platform, connecting processes together, by offering the option to provide data to
     the shell project environment and to request this data
+
+    :ivar command_watchers: (list) The DirectoryWatcher threads watching the command directories for changed command
+    modules, in case the hot reload is enabled, empty otherwise
     """
     def __init__(self):
         super(ShellServer, self).__init__()
@@ -57,7 +71,22 @@ class ShellServer(threading.Thread):
         self.config_parser["Paths"]["project_dir"] = self.project_directory
 
         # setting up the command reference dictionary
-        self.command_reference_dictionary = translate.CommandReferenceDictionary()
+        self.command_reference_dictionary = translate.CommandReferenceDictionary(
+            translate.get_command_directories(self.config_parser, self.project_directory))
+        # the cache of the translations, shared by all the shells
+        cache_size = self.config_parser.getint("Shell", "translation_cache_size", fallback=256)
+        # optionally the translations are persisted, so that they survive a restart of the server
+        disk_cache = None
+        if self.config_parser.getboolean("Shell", "persistent_cache", fallback=False):
+            disk_cache = cacheutil.DiskCache(self.config_parser.get("Paths", "cache_dir",
+                                                                    fallback=os.path.join(self.project_directory,
+                                                                                          "cache")),
+                                             self.config_parser.getint("Shell", "persistent_cache_size",
+                                                                       fallback=1024))
+            disk_cache.prune()
+        self.translation_cache = translate.TranslationCache(self.command_reference_dictionary, cache_size, disk_cache)
+        # the size of the cache of compiled code objects, that is shared by all the shells
+        execute.CODE_CACHE.max_size = self.config_parser.getint("Shell", "code_cache_size", fallback=256)
 
         # setting up the process list
         self.process_list = process.ProcessList()
@@ -73,6 +102,16 @@ class ShellServer(threading.Thread):
         self.data_nexus = datamanage.DataNexus(self.process_list, self.env_variable_container,
                                                self.command_reference_dictionary)
         self.data_nexus.start()
+
+        # optionally watching the command directory, so that changed command modules are reloaded without a restart
+        self.command_watchers = []
+        if self.config_parser.getboolean("Shell", "hot_reload", fallback=False):
+            for command_directory in self.command_reference_dictionary.command_directories:
+                command_watcher = watchutil.DirectoryWatcher(
+                    command_directory, self.reload_commands,
+                    self.config_parser.getfloat("Shell", "hot_reload_interval", fallback=1.0))
+                command_watcher.start()
+                self.command_watchers.append(command_watcher)
         self.running = True
 
     def run(self):
@@ -137,6 +176,49 @@ class ShellServer(threading.Thread):
                         # ui windows
                         os.remove(file_path)
 
+    def reload_commands(self, file_names):
+        """
+        Reloads the command modules, whose files have been changed, which is called by the watcher of the command
+        directory. Executions, that are running, keep the old version of the commands. The modules, that could not be
+        reloaded, are reported as error messages to the uis of all the running shells
+        Args:
+            file_names: The iterable of the names of the changed files within the command directory
+
+        Returns:
+        void
+        """
+        module_names = {os.path.splitext(file_name)[0] for file_name in file_names}
+        error_dict = self.command_reference_dictionary.reload_modules(module_names)
+        for module_name, exception in error_dict.items():
+            for shell in [shell for shell in self.shell_list if shell.running]:
+                error_message = datamanage.ErrorMessage(exception)
+                error_message.content = "The command module '{}' could not be reloaded: {}".format(module_name,
+                                                                                                   exception)
+                shell.output_q.put(error_message)
+
+    def run_script(self, file_path, output_queue=None):
+        """
+        Runs the script file, which is written in the shell language, within a new shell, by issuing the 'run_script'
+        command. The messages of the script are put into the output queue of that shell as they are produced, so they
+        can be processed by the caller, the shell is stopped as soon as the script has finished.
+        Args:
+            file_path: The string path of the script file
+            output_queue: The queue for the messages of the script. None on default, in which case a new
+                multiprocessing Queue is created
+
+        Returns:
+        The Shell, that is running the script
+        """
+        if output_queue is None:
+            output_queue = multiprocessing.Queue()
+        input_queue = multiprocessing.Queue()
+        shell = Shell(self, input_queue, output_queue)
+        self.shell_list.append(shell)
+        shell.start()
+        input_queue.put("run_script({!r})".format(os.path.abspath(file_path)))
+        shell.stop()
+        return shell
+
     def stop(self):
         """
         This method stops the whole shell server system, including stopping every shell Thread, terminating every
@@ -148,6 +230,11 @@ class ShellServer(threading.Thread):
         """
         # Stopping all the processes/ all the programs that were started with the shell server system
         self.process_list.stop_all()
+        # the persistent translations, that have not been written yet, would be lost otherwise
+        if self.translation_cache.disk_cache is not None:
+            self.translation_cache.disk_cache.flush()
+        for command_watcher in self.command_watchers:
+            command_watcher.stop()
         # Stopping the loops of all the shell threads
         for shell in self.shell_list:
             shell.running = False
@@ -183,6 +270,172 @@ def _exec(module_path, q1, q2):
     exec(compiled_string)
 
 
+class _Command:
+    """
+    The record of a single input, that is being processed by a shell
+
+    :ivar command_id: (int) The id of the command, which all the messages of its execution are tagged with
+
+    :ivar input_string: (string) The input of the user
+
+    :ivar timings: (dict) The durations of the stages of the command, that have been passed so far
+
+    :ivar start: (float) The time the shell received the input, as returned by 'time.perf_counter'
+
+    :ivar timeout: (float) The time in seconds, after which the running command is cancelled, None for no timeout
+
+    :ivar thread_id: (int) The identifier of the worker thread, while it is executing the command, None otherwise
+
+    :ivar cancel_reason: (string) The description of why the command has been cancelled, None as long as it is not
+    """
+    def __init__(self, command_id, input_string, timings, start, timeout=None):
+        self.command_id = command_id
+        self.input_string = input_string
+        self.timings = timings
+        self.start = start
+        self.timeout = timeout
+        self.thread_id = None
+        self.cancel_reason = None
+
+
+class _CommandFinished:
+    """
+    The marker, that is put into the print queue of a shell by its foreground worker, after the execution of a command
+    has finished, so that the shell knows, that all the messages of the execution have been relayed
+
+    :ivar command: (_Command) The command, whose execution has finished
+
+    :ivar future: (concurrent.futures.Future) The future of the finished execution
+
+    :ivar time: (float) The time the execution finished, as returned by 'time.perf_counter'
+    """
+    def __init__(self, command, future):
+        self.command = command
+        self.future = future
+        self.time = time.perf_counter()
+
+
+class _StopRequest:
+    """
+    The request to stop a shell, after all the inputs, that have been put into its input queue before, have been
+    processed, see 'Shell.stop'
+    """
+
+
+class _Prompt:
+    """
+    The input prompt of a command, that is waiting for the response of the user
+
+    :ivar command_id: (int) The id of the command, that issued the prompt
+
+    :ivar event: (threading.Event) The event, that is set as soon as the prompt has been answered or cancelled
+
+    :ivar response: (string) The response of the user, None as long as there is none
+    """
+    def __init__(self, command_id):
+        self.command_id = command_id
+        self.event = threading.Event()
+        self.response = None
+
+
+class _TimeoutMonitor:
+    """
+    The single thread of a shell, that cancels the commands exceeding their timeouts. The deadlines of the commands are
+    kept in a heap, so that the thread only ever waits for the earliest one, instead of every command starting a timer
+    thread of its own. The deadlines of the commands, that finish in time, are simply dropped once they are reached,
+    as cancelling a finished command has no effect
+
+    :ivar shell: (Shell) The shell, whose commands are cancelled
+    """
+    def __init__(self, shell):
+        self.shell = shell
+
+        self._deadlines = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = True
+
+    def add(self, command):
+        """
+        Adds the deadline of the command, that is starting just now, starting the thread on the first call
+        :param command: (_Command) the command with a timeout
+        :return: (void)
+        """
+        with self._condition:
+            heapq.heappush(self._deadlines, (time.monotonic() + command.timeout, command.command_id, command.timeout))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ShellTimeoutMonitor", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def stop(self):
+        """
+        Ends the thread, the commands, that are still running, are not cancelled anymore
+        :return: (void)
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def _run(self):
+        """
+        The loop of the thread, waiting for the earliest deadline and cancelling its command
+        :return: (void)
+        """
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                if len(self._deadlines) == 0:
+                    self._condition.wait()
+                    continue
+                remaining_time = self._deadlines[0][0] - time.monotonic()
+                if remaining_time > 0:
+                    # a new earlier deadline or the stop wakes the thread up early
+                    self._condition.wait(remaining_time)
+                    continue
+                _, command_id, timeout = heapq.heappop(self._deadlines)
+            self.shell.cancel_command(command_id, "The command {} exceeded its timeout of {} seconds".format(
+                command_id, timeout))
+
+
+# The strings, that are accepted as response to a prompt for a boolean value
+TRUE_STRINGS = ("y", "yes", "true", "1")
+FALSE_STRINGS = ("n", "no", "false", "0")
+
+
+def _convert_response(response, data_type):
+    """
+    Converts the response of the user into the requested type. For booleans the strings 'yes'/'no', 'y'/'n',
+    'true'/'false' and '1'/'0' are accepted, regardless of the case
+    :param response: (string) the response of the user
+    :param data_type: (type) the type to convert the response into, for example int or float
+    :return: (any) the converted response
+    """
+    if data_type is bool:
+        if response.strip().lower() in TRUE_STRINGS:
+            return True
+        if response.strip().lower() in FALSE_STRINGS:
+            return False
+        raise ValueError("The input '{}' is neither yes nor no".format(response))
+    try:
+        return data_type(response)
+    except (ValueError, TypeError):
+        raise ValueError("The input '{}' is not a valid {}".format(response, data_type.__name__)) from None
+
+
+def _raise_in_thread(thread_id, exception_class):
+    """
+    Schedules the exception to be raised within the thread with the given id, as soon as the thread executes python
+    byte code again. Passing None as the exception class revokes the scheduled exception, that has not been raised yet
+    :param thread_id: (int) the identifier of the thread as returned by 'threading.get_ident'
+    :param exception_class: (type) the class of the exception or None
+    :return: (void)
+    """
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id),
+                                               None if exception_class is None else ctypes.py_object(exception_class))
+
+
 # TODO: add command cache/ logging
 class Shell(threading.Thread):
     """
@@ -201,7 +454,21 @@ class Shell(threading.Thread):
     :ivar output_queue: (multiprocessing.Queue) The queue, through which the infos, errors, results etc. of the executed
     commands are being sent back to the issueing program
 
-    :ivar print_q: (multiprocessing.Queue) The queue, through which the print messages of the runnning code arrives
+    :ivar print_q: (queue.Queue) The queue, through which the markers of the finished executions arrive, as well as
+    the print messages of the running code, in case they are not delivered directly
+
+    :ivar direct_output: (boolean) Whether the messages of the commands are put into the output queue directly
+
+    :ivar pipelined: (boolean) Whether the next inputs are executed while the previous commands are still running
+
+    :ivar executor: (concurrent.futures.ThreadPoolExecutor) The long lived foreground workers, executing the inputs
+
+    :ivar namespace: (dict) The globals of the executions of the shell, kept from one input to the next
+
+    :ivar latency_recorder: (LatencyRecorder) The ring buffer of the durations of the stages of the recent inputs
+
+    :ivar workers: (queue.Queue) The idle ForegroundWorker processes, in case the commands are executed within worker
+    processes, None otherwise
     """
     def __init__(self, shellserver, input_queue, output_queue):
         super(Shell, self).__init__()
@@ -221,79 +488,405 @@ class Shell(threading.Thread):
         # The running variable of the Thread
         self.running = True
 
-        # The queue where print messages will be put in by the process
-        self.print_q = multiprocessing.Queue()
-
-        self.user_input_response = None
+        # The queue where print messages will be put in by the foreground execution. As the execution is a thread of
+        # the same process, a simple thread safe queue is sufficient
+        self.print_q = queue.Queue()
+        # Whether the messages are put into the output queue by the thread printing them, instead of being relayed by
+        # the shell, which saves a thread switch for every message
+        self.direct_output = self.shell_server.config_parser.getboolean("Shell", "direct_output", fallback=True)
+        # Whether multiple commands can be executed at the same time, each input being handed to the next free worker
+        # without waiting for the previous commands to finish
+        self.pipelined = self.shell_server.config_parser.getboolean("Shell", "pipelined", fallback=False)
+        # The foreground worker threads, that are started once and execute one input after another
+        worker_amount = 1
+        if self.pipelined:
+            worker_amount = self.shell_server.config_parser.getint("Shell", "pipeline_size", fallback=4)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=worker_amount,
+                                                              thread_name_prefix="ShellForeground")
+        # The ids of the commands and the command, that is executed by the current worker thread
+        self._command_ids = itertools.count(1)
+        self._command_context = threading.local()
+        # The commands, that have been handed to the workers and have not finished yet, so that they can be cancelled
+        self._commands = {}
+        self._command_lock = threading.Lock()
+        # The time in seconds, after which a running command is cancelled, in case its input does not specify its own
+        self.command_timeout = self.shell_server.config_parser.getfloat("Shell", "command_timeout", fallback=0) or None
+        self._timeout_monitor = _TimeoutMonitor(self)
+
+        # The inputs, that are commands, as the cancel requests and the responses to input prompts are sorted out by
+        # the input thread of the shell, as soon as they arrive
+        self._inputs = queue.Queue()
+        # The input prompts waiting for the response of the user, in the order they have been issued
+        self._prompts = collections.deque()
+        # The time in seconds, after which an input prompt without response raises a TimeoutError, unless the command
+        # specifies its own timeout
+        self.prompt_timeout = self.shell_server.config_parser.getfloat("Shell", "prompt_timeout", fallback=0) or None
+
+        # The mode of the translation, either the python source code or the compiled code object
+        self.translation_mode = self.shell_server.config_parser.get("Shell", "translation_mode",
+                                                                    fallback=translate.MODE_SOURCE)
+        # Whether the command modules are injected into the namespace of the execution instead of being imported
+        self.inject_modules = self.shell_server.config_parser.getboolean("Shell", "inject_modules", fallback=False)
+        # Whether the environmental variables used within loops are hoisted out of them, only in the code mode
+        self.hoist_variables = self.shell_server.config_parser.getboolean("Shell", "hoist_variables", fallback=False)
+
+        # The ShellCom of the foreground executions and the globals dict of the executions, which is optionally kept
+        # from one input to the next, so that names assigned at the prompt stay defined for the following inputs
+        self.fg_com = datamanage.ForegroundShellCom(self.shell_server, self)
+        self.persistent_namespace = self.shell_server.config_parser.getboolean("Shell", "persistent_namespace",
+                                                                              fallback=False)
+        self.namespace = execute.create_namespace(self)
+
+        # The durations of the stages of the most recent inputs, which can be displayed with the 'stats' command
+        self.latency_recorder = timingutil.LatencyRecorder(
+            self.shell_server.config_parser.getint("Shell", "latency_buffer_size", fallback=1000))
+
+        # optionally the commands are executed within pre-started worker processes, one for every foreground worker
+        # thread, so that the commands of multiple shells can use multiple cores
+        self.workers = None
+        if self.shell_server.config_parser.getboolean("Shell", "worker_process", fallback=False):
+            self.workers = queue.Queue()
+            for _ in range(worker_amount):
+                self.workers.put(worker.ForegroundWorker(self))
 
     def run(self):
         """
         the main loop of the 'Shell' Thread, first waiting for any code input to appear within the input queue, which is
-        then being translated into proper standard python. The translated string will be used as the argument of the
-        threaded execution process (utilizing the python interpreter).
-        While the command is executed within a separate Thread it is supposed to be printing status information, error
+        then being translated into proper standard python. The translated string is then handed to the foreground
+        worker of the shell, which executes it (utilizing the python interpreter).
+        While the command is executed by the worker thread it is supposed to be printing status information, error
         and result messages into the shell communication interface "ShellCom", which is ultimately linked to the shells
-        'print_q' Queue. This print queue is then being observed as long as the Thread is alive. The messages arriving
-        from the executed command in the printing queue are then redirected to the 'output_q' Queue of the shell, so
-        that they can be displayed/processed by the connected user interface
+        'print_q' Queue. The messages arriving from the executed command in the printing queue are redirected to the
+        'output_q' Queue of the shell, so that they can be displayed/processed by the connected user interface, until
+        the worker puts the marker of the finished execution into the print queue. With the direct output the
+        messages are put into the output queue right away, only the marker is passed through the print queue.
+        In the pipelined mode the messages are relayed by a separate thread instead, so that the main loop can already
+        hand the next inputs to the other workers, while the previous commands are still running.
+        The input queue itself is read by the input thread of the shell, so that a command can be cancelled, while the
+        main loop is busy with relaying its messages
         :return: (void)
         """
+        threading.Thread(target=self._read_inputs, daemon=True).start()
+        relay_thread = None
+        if self.pipelined:
+            relay_thread = threading.Thread(target=self._relay_messages, daemon=True)
+            relay_thread.start()
+
         while self.running:
 
             # waiting for the user input to be passed through the queue. The get() method of a Queue is blocking unless
             # that behaviour is specifically turned off
-            user_input = self.input_q.get()
+            user_input = self._inputs.get()
+            if isinstance(user_input, _StopRequest):
+                break
+            # the durations of the stages of the input in seconds, the time waited in the queue is only known, in case
+            # the ui has sent the time the input has been entered
+            start = time.perf_counter()
+            timings = {}
+            timeout = self.command_timeout
+            if isinstance(user_input, datamanage.UserInput):
+                timings[timingutil.STAGE_QUEUE] = max(time.time() - user_input.timestamp, 0)
+                if user_input.timeout is not None:
+                    timeout = user_input.timeout
+                user_input = user_input.string
+
+            command = _Command(next(self._command_ids), user_input, timings, start, timeout)
+            try:
+                # translating the user input with the translate function, essentially converting the shell syntax
+                # elements into standard python syntax, so it can be executed by the interpreter. The translation is
+                # inside the try statement, as the code mode already reports syntax errors
+                translated_string = self.translate_input(user_input)
+                timings[timingutil.STAGE_TRANSLATE] = time.perf_counter() - start
+
+                # executing the user input by the foreground worker, because the main loop of this Shell-Thread has
+                # to be relaying the print messages, as the command is being executed. The marker of the finished
+                # execution is put into the print queue after all the messages of the execution
+                with self._command_lock:
+                    self._commands[command.command_id] = command
+                future = self.executor.submit(self._execute_command, command, translated_string)
+                future.add_done_callback(lambda finished_future, command=command:
+                                         self.print_q.put(_CommandFinished(command, finished_future)))
+
+            # printing a possible exception to the ui
+            except Exception as e:
+                self._put_output(datamanage.ErrorMessage(e), command.command_id)
+                self._record_command(command)
+                continue
+
+            if not self.pipelined:
+                self._relay_messages(command)
+
+        if self.running:
+            # stopped by the stop request, the commands, that are still running, are finished and their messages
+            # relayed, before the shell ends
+            self.executor.shutdown(wait=True)
+            if relay_thread is not None:
+                self.print_q.put(_StopRequest())
+                relay_thread.join()
+            self.running = False
+            # waking up the input thread, so that it notices the end of the shell
+            self.input_q.put(_StopRequest())
+            if self in self.shell_server.shell_list:
+                self.shell_server.shell_list.remove(self)
+
+        # the worker threads finish the possibly running executions, but do not accept any new ones
+        self.executor.shutdown(wait=False)
+        self._timeout_monitor.stop()
+        if self.workers is not None:
+            while not self.workers.empty():
+                self.workers.get().stop()
+
+    def stop(self):
+        """
+        Stops the shell, after all the inputs, that have been put into the input queue so far, have been processed and
+        their commands have finished. Input prompts of those commands can still be answered in the meantime
+        :return: (void)
+        """
+        self.input_q.put(_StopRequest())
+
+    def get_command_id(self):
+        """
+        :return: (int) the id of the command, that is executed by the calling thread, None if the calling thread is not
+        one of the foreground workers of the shell
+        """
+        command = getattr(self._command_context, "command", None)
+        return None if command is None else command.command_id
 
-            # translating the user input with the translate function, essentially converting the shell syntax elements
-            # into standard python syntax, so it can be executed by the interpreter
-            translated_string = translate.translate(user_input, self.shell_server.command_reference_dictionary)
+    def check_cancelled(self):
+        """
+        Raises the CommandCancelled exception, in case the command executed by the calling thread has been cancelled
+        :return: (void)
+        """
+        command = getattr(self._command_context, "command", None)
+        if command is not None and command.cancel_reason is not None:
+            raise datamanage.CommandCancelled(command.cancel_reason)
+
+    def cancel_command(self, command_id=None, reason=None):
+        """
+        Cancels the command, that has not finished yet. In case it is running, the CommandCancelled exception is raised
+        within its worker thread as soon as the thread executes python code again, in case it has not been started yet,
+        it will not be executed at all. Either way the exception is reported to the ui as the error of the command
+        :param command_id: (int) the id of the command. None on default, in which case all the commands are cancelled
+        :param reason: (string) the description of the cancellation, that is reported. None on default, in which case
+        the command is reported as being cancelled by the user
+        :return: (int) the amount of cancelled commands
+        """
+        with self._command_lock:
+            if command_id is None:
+                command_list = list(self._commands.values())
+            else:
+                command_list = [self._commands[command_id]] if command_id in self._commands else []
+
+            command_list = [command for command in command_list if command.cancel_reason is None]
+            for command in command_list:
+                command.cancel_reason = reason or "The command {} has been cancelled".format(command.command_id)
+                if command.thread_id is not None:
+                    _raise_in_thread(command.thread_id, datamanage.CommandCancelled)
+                # waking up the prompts of the command, as waiting for the event is not interrupted by the exception
+                for prompt in [prompt for prompt in self._prompts if prompt.command_id == command.command_id]:
+                    self._prompts.remove(prompt)
+                    prompt.event.set()
+        return len(command_list)
+
+    def prompt_input(self, prompt_string, timeout=None, data_type=None):
+        """
+        Issues an input prompt for the command, that is executed by the calling thread, and waits for the response of
+        the user without using any processor time. Multiple commands can be waiting for their prompts at the same
+        time, the responses are assigned to the prompts in the order the prompts have been issued
+        :param prompt_string: (string) the prompt displayed to the user
+        :param timeout: (float) the time in seconds to wait for the response. None on default, in which case the
+        configured prompt timeout applies
+        :param data_type: (type) the type to convert the response into, for example int, float or bool. None on
+        default, in which case the response string is returned
+        :return: (any) the response of the user
+        """
+        prompt = _Prompt(self.get_command_id())
+        # the prompt has to be registered before the ui can possibly answer it
+        with self._command_lock:
+            self._prompts.append(prompt)
+        self.put_message(datamanage.InputPromptMessage(prompt_string))
+
+        if not prompt.event.wait(timeout or self.prompt_timeout):
+            with self._command_lock:
+                if prompt in self._prompts:
+                    self._prompts.remove(prompt)
+            if not prompt.event.is_set():
+                raise TimeoutError("There has been no response to the input prompt '{}'".format(prompt_string))
+        # the event is also set, in case the command has been cancelled
+        self.check_cancelled()
+
+        if data_type is None:
+            return prompt.response
+        return _convert_response(prompt.response, data_type)
+
+    def _execute_command(self, command, translated_string):
+        """
+        Executes the translated input of the command within the calling foreground worker, which is marked as executing
+        the command, so that the messages printed by the execution are tagged with the id of the command and the command
+        can be cancelled. In case the command has a timeout, it is cancelled after that time
+        :param command: (_Command) the command, whose input is executed
+        :param translated_string: (string/code) the translated input
+        :return: (void)
+        """
+        try:
+            with self._command_lock:
+                if command.cancel_reason is not None:
+                    raise datamanage.CommandCancelled(command.cancel_reason)
+                command.thread_id = threading.get_ident()
+            self._command_context.command = command
+
+            if command.timeout is not None:
+                self._timeout_monitor.add(command)
 
-            # executing the user input as a Thread, because the main loop of this Shell-Thread has to be waiting for the
-            # print messages to come in, as the command is being executed
             try:
-                foreground_thread = threading.Thread(target=execute.execute, args=(self, translated_string,))
-                foreground_thread.start()
-
-                while foreground_thread.is_alive():
-                    # not to overload the processor, can be tweeked at higher loads
-                    time.sleep(1/1000)
-                    # fetching the output from the command and putting it into the output queue to the ui
-                    # the try statement is important to catch the queue.Empty exception of the non blocking queue
-                    # get access, which in turn is needed for proper function of the loop, as a blocking call would hang
-                    # the program at least at every second background function
+                if self.workers is None:
+                    execute.execute(self, translated_string, command.timings)
+                else:
+                    foreground_worker = self.workers.get()
                     try:
-                        execute_output = self.print_q.get(block=False)
-                        # checking whether an input prompt has been issued by the executed shell, by delivering an
-                        # InputPromptMessage
-                        self.output_q.put(execute_output)
-                        # checking whether an input prompt has been issued by the executed shell, by delivering an
-                        # InputPromptMessage
-                        if isinstance(execute_output, datamanage.InputPromptMessage):
-                            while True:
-                                try:
-                                    self.user_input_response = self.input_q.get()
-                                    break
-                                except queue.Empty:
-                                    pass
-                    except queue.Empty:
-                        pass
+                        foreground_worker.execute(command, translated_string)
+                    finally:
+                        self.workers.put(foreground_worker)
+            except datamanage.CommandCancelled:
+                # the asynchronous exception can only be raised without any arguments
+                raise datamanage.CommandCancelled(command.cancel_reason) from None
+        finally:
+            # the cancellation might happen just now, the exception is then either revoked or raised again, until the
+            # command is not marked as running anymore
+            while True:
+                try:
+                    self._end_command(command)
+                    break
+                except datamanage.CommandCancelled:
+                    pass
+
+    def _end_command(self, command):
+        """
+        Marks the command as not running anymore, revoking a cancellation, that has not been raised yet
+        :param command: (_Command) the command, that has been executed by the calling thread
+        :return: (void)
+        """
+        self._command_context.command = None
+        with self._command_lock:
+            self._commands.pop(command.command_id, None)
+            if command.thread_id is not None and command.cancel_reason is not None:
+                _raise_in_thread(command.thread_id, None)
+            command.thread_id = None
+
+    def _read_inputs(self):
+        """
+        The loop of the input thread of the shell, that reads the input queue as long as the shell is running. The
+        cancel requests are carried out right away and the responses to input prompts are passed to the oldest waiting
+        prompt, all the other inputs are passed to the main loop of the shell
+        :return: (void)
+        """
+        while self.running:
+            user_input = self.input_q.get()
+            if isinstance(user_input, datamanage.CancelRequest):
+                self.cancel_command(user_input.command_id)
+                continue
+            if isinstance(user_input, _StopRequest):
+                self._inputs.put(user_input)
+                continue
+
+            with self._command_lock:
+                prompt = self._prompts.popleft() if len(self._prompts) != 0 else None
+            if prompt is not None:
+                if isinstance(user_input, datamanage.UserInput):
+                    user_input = user_input.string
+                prompt.response = user_input
+                prompt.event.set()
+            else:
+                self._inputs.put(user_input)
+
+    def put_message(self, message):
+        """
+        Delivers the message printed by the command, that is executed by the calling thread, tagging it with the id of
+        the command. With the direct output the message is put into the output queue right away, otherwise it is
+        relayed through the print queue
+        :param message: (Message) the message
+        :return: (void)
+        """
+        message.command_id = self.get_command_id()
+        if self.direct_output:
+            self._deliver(message)
+        else:
+            self.print_q.put(message)
 
-                time.sleep(0.01)
-                # printing the messages, that migh have gotten stuck in the queue just after Thread termination
-                while not(self.print_q.empty()):
-                    try:
-                        execute_output = self.print_q.get(block=False)
-                        self.output_q.put(execute_output)
-                    except queue.Empty:
-                        pass
+    def _deliver(self, message):
+        """
+        Puts the message into the output queue
+        :param message: (Message) the message, already tagged with the id of its command
+        :return: (void)
+        """
+        self.output_q.put(message)
 
-            # printing a possible exception to the ui
-            except Exception as e:
-                self.output_q.put(datamanage.ErrorMessage(e))
-
-    def get_input(self):
-        while self.user_input_response is None:
-            time.sleep(1/1000)
-        temp = self.user_input_response
-        self.user_input_response = None
-        return temp
\ No newline at end of file
+    def _relay_messages(self, command=None):
+        """
+        Relays the messages of the print queue to the output queue, until the marker of the given command has been
+        relayed
+        :param command: (_Command) the command, whose end the relaying waits for. None on default, in which case the
+        messages are relayed as long as the shell is running
+        :return: (void)
+        """
+        while self.running:
+            # fetching the output from the command and putting it into the output queue to the ui, the blocking get
+            # returns as soon as there is a message, so there is no need for polling
+            execute_output = self.print_q.get()
+            if isinstance(execute_output, _StopRequest):
+                return
+            if isinstance(execute_output, _CommandFinished):
+                # the relay stage is the time it took to deliver the remaining messages after the execution
+                finished_command = execute_output.command
+                finished_command.timings[timingutil.STAGE_RELAY] = time.perf_counter() - execute_output.time
+                if execute_output.future.exception() is not None:
+                    self._put_output(datamanage.ErrorMessage(execute_output.future.exception()),
+                                     finished_command.command_id)
+                self._record_command(finished_command)
+                if finished_command is command:
+                    return
+                continue
+            self._deliver(execute_output)
+
+    def _put_output(self, message, command_id):
+        """
+        Puts the message, that has been created by the shell itself on behalf of a command, into the output queue
+        :param message: (Message) the message
+        :param command_id: (int) the id of the command, the message belongs to
+        :return: (void)
+        """
+        message.command_id = command_id
+        self.output_q.put(message)
+
+    def _record_command(self, command):
+        """
+        Adds the timings of the processed command to the latency recorder
+        :param command: (_Command) the command, that has been processed
+        :return: (void)
+        """
+        command.timings[timingutil.STAGE_TOTAL] = time.perf_counter() - command.start
+        self.latency_recorder.record(command.input_string, command.timings)
+
+    def translate_input(self, input_string, use_cache=True):
+        """
+        Translates the given input string with the translation options of this shell
+        :param input_string: (string) the code written in the shell language
+        :param use_cache: (boolean) whether the translation is taken from/ put into the in memory translation cache of
+        the shell server. True on default, whole scripts only use the persistent cache, in case it is enabled
+        :return: (string/code) the translated python code
+        """
+        return self.shell_server.translation_cache.translate(input_string, self.translation_mode, self.inject_modules,
+                                                             self.hoist_variables, memory=use_cache)
+
+    def execute_script(self, file_path):
+        """
+        Executes the whole script file, which is written in the shell language, within the calling thread. The script
+        is translated and compiled only once instead of line by line. As the calling thread is the execution thread of
+        a command (see the 'run_script' command), the messages of the script are relayed to the output queue by the
+        main loop of the shell, as they are produced
+        :param file_path: (string) the path of the script file
+        :return: (void)
+        """
+        with open(file_path, "r") as file:
+            script_string = file.read()
+        execute.execute(self, self.translate_input(script_string, use_cache=False), use_cache=False)
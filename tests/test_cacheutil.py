@@ -0,0 +1,58 @@
+__author__ = 'Jonas'
+import unittest
+import tempfile
+import os
+import JTSv2.lib.cacheutil as cacheutil
+
+
+class TestCacheUtil(unittest.TestCase):
+
+    def test_lru_cache(self):
+        cache = cacheutil.LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        # 'b' is the least recently used entry now
+        cache.put("c", 3)
+        self.assertEqual([True, False, True], [key in cache for key in ("a", "b", "c")])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual({"size": 2, "max_size": 2, "hits": 1, "misses": 1, "evictions": 1}, cache.statistics())
+
+    def test_code_cache(self):
+        code_cache = cacheutil.CodeCache()
+        code = code_cache.compile("x = 1")
+        self.assertIs(code, code_cache.compile("x = 1"))
+        self.assertEqual(1, code_cache.statistics()["hits"])
+
+        other_code_cache = cacheutil.CodeCache()
+        other_code_cache.update(code_cache.export())
+        namespace = {}
+        exec(other_code_cache.compile("x = 1"), namespace)
+        self.assertEqual((1, 1), (namespace["x"], other_code_cache.statistics()["hits"]))
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk_cache = cacheutil.DiskCache(directory, max_entries=10)
+            key = disk_cache.make_key("input", 1)
+            self.assertIsNone(disk_cache.get(key))
+            disk_cache.put(key, ("translation", None))
+            self.assertEqual(("translation", None), disk_cache.get(key))
+            disk_cache.flush()
+
+            # the entry has been written and can be read by another cache of the same directory
+            self.assertEqual(("translation", None), cacheutil.DiskCache(directory).get(key))
+            self.assertEqual({"max_entries": 10, "hits": 1, "misses": 1}, disk_cache.statistics())
+
+    def test_disk_cache_prune(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk_cache = cacheutil.DiskCache(directory, max_entries=10)
+            for index in range(25):
+                disk_cache.put(disk_cache.make_key(index), str(index))
+            disk_cache.flush()
+            # the maximum amount is enforced while writing, without an explicit prune
+            self.assertLessEqual(len(os.listdir(directory)), 10)
+            self.assertEqual("24", disk_cache.get(disk_cache.make_key(24)))
+
+
+if __name__ == '__main__':
+    unittest.main()
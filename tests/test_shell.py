@@ -0,0 +1,186 @@
+__author__ = 'Jonas'
+import unittest
+import configparser
+import tempfile
+import queue
+import types
+import time
+import os
+import JTSv2.datamanage as datamanage
+import JTSv2.shell as shell
+import JTSv2.execute as execute
+
+
+class _TranslationCache:
+    """
+    Passes the inputs on as they are, as the inputs of the tests are pure python. Only the 'run_script' command, that is
+    issued by the shell server, is translated into the call of the foreground shell com
+    """
+    def translate(self, input_string, *args, **kwargs):
+        if input_string.startswith("run_script("):
+            return "fg_com." + input_string
+        return input_string
+
+
+def _create_shell_server(**options):
+    """
+    Creates a minimal shell server, that provides everything a shell needs
+    :param options: the options of the 'Shell' section of the config as keyword arguments
+    :return: (SimpleNamespace) the shell server
+    """
+    config_parser = configparser.ConfigParser()
+    config_parser.read_dict({"Shell": options, "Paths": {}})
+    return types.SimpleNamespace(config_parser=config_parser, env_variable_container={"a": 1}, process_list=[],
+                                 translation_cache=_TranslationCache(), project_directory=tempfile.gettempdir(),
+                                 shell_list=[],
+                                 command_reference_dictionary=types.SimpleNamespace(generation=0, reload_count=0))
+
+
+def _create_shell(**options):
+    """
+    Starts a shell with the given options of the 'Shell' section of the config, connected to a minimal shell server
+    :param options: the options as keyword arguments
+    :return: (Shell) the running shell
+    """
+    shell_server = _create_shell_server(**options)
+    test_shell = shell.Shell(shell_server, queue.Queue(), queue.Queue())
+    shell_server.shell_list.append(test_shell)
+    test_shell.daemon = True
+    test_shell.start()
+    return test_shell
+
+
+class TestShell(unittest.TestCase):
+
+    def start_shell(self, **options):
+        test_shell = _create_shell(**options)
+        self.addCleanup(test_shell.join, 10)
+        self.addCleanup(test_shell.stop)
+        return test_shell
+
+    def get_message(self, test_shell):
+        return test_shell.output_q.get(timeout=10)
+
+    def test_worker_reuse(self):
+        test_shell = self.start_shell()
+        for _ in range(2):
+            test_shell.input_q.put("import threading\nfg_com.print_info(str(threading.get_ident()))")
+        # both of the inputs are executed by the same long lived worker thread
+        first_message, second_message = self.get_message(test_shell), self.get_message(test_shell)
+        self.assertEqual((1, 2), (first_message.command_id, second_message.command_id))
+        self.assertEqual(first_message.content, second_message.content)
+
+    def test_pipelined_command_ids(self):
+        test_shell = self.start_shell(pipelined=True, pipeline_size=2)
+        test_shell.input_q.put("import time\ntime.sleep(0.5)\nfg_com.print_info('slow')")
+        test_shell.input_q.put("fg_com.print_info('fast')")
+        # the second command does not wait for the first one, the messages are tagged with the ids of their commands
+        self.assertEqual([("fast", 2), ("slow", 1)],
+                         [(message.content, message.command_id) for message in
+                          (self.get_message(test_shell), self.get_message(test_shell))])
+
+    def test_cancel_command(self):
+        test_shell = self.start_shell()
+        test_shell.input_q.put("fg_com.print_info('started')\nwhile True:\n    pass")
+        self.assertEqual("started", self.get_message(test_shell).content)
+        test_shell.input_q.put(datamanage.CancelRequest(1))
+
+        message = self.get_message(test_shell)
+        self.assertEqual(("CommandCancelled", 1), (message.exception_name, message.command_id))
+        test_shell.input_q.put("fg_com.print_info('alive')")
+        message = self.get_message(test_shell)
+        self.assertEqual(("alive", 2), (message.content, message.command_id))
+
+    def test_command_timeout(self):
+        test_shell = self.start_shell(command_timeout=10)
+        # the timeout of the input takes precedence over the configured one
+        test_shell.input_q.put(datamanage.UserInput("while True:\n    pass", time.time(), timeout=0.2))
+        message = self.get_message(test_shell)
+        self.assertEqual("CommandCancelled", message.exception_name)
+        self.assertIn("timeout", message.content)
+
+    def test_worker_process(self):
+        test_shell = self.start_shell(worker_process=True)
+        test_shell.input_q.put("import os\nEnV['b'] = EnV['a'] + 1\nfg_com.print_info(str(os.getpid()))")
+        self.assertNotEqual(str(os.getpid()), self.get_message(test_shell).content)
+        self.assertEqual(2, test_shell.env_variable_container["b"])
+
+        test_shell.input_q.put("1/0")
+        self.assertEqual("ZeroDivisionError", self.get_message(test_shell).exception_name)
+
+        # the worker process is interrupted right away, even while it is sleeping
+        test_shell.input_q.put("fg_com.print_info('started')\nimport time\ntime.sleep(10)")
+        self.assertEqual("started", self.get_message(test_shell).content)
+        start = time.perf_counter()
+        test_shell.input_q.put(datamanage.CancelRequest())
+        self.assertEqual("CommandCancelled", self.get_message(test_shell).exception_name)
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_direct_output(self):
+        for direct_output in (True, False):
+            test_shell = self.start_shell(direct_output=direct_output)
+            test_shell.input_q.put("for i in range(3):\n    fg_com.print_info(str(i))")
+            # the messages arrive in order and tagged with their command, whether they are relayed or not
+            self.assertEqual([("0", 1), ("1", 1), ("2", 1)],
+                             [(message.content, message.command_id) for message in
+                              (self.get_message(test_shell) for _ in range(3))])
+
+    def test_prompt_input(self):
+        test_shell = self.start_shell(prompt_timeout=0.2)
+        test_shell.input_q.put("fg_com.print_result(fg_com.prompt_input('number?', 10, int) + 1)")
+        self.assertIsInstance(self.get_message(test_shell), datamanage.InputPromptMessage)
+        test_shell.input_q.put("41")
+        self.assertEqual("42", str(self.get_message(test_shell).content))
+
+        test_shell.input_q.put("fg_com.prompt_input('name?')")
+        self.assertIsInstance(self.get_message(test_shell), datamanage.InputPromptMessage)
+        self.assertEqual("TimeoutError", self.get_message(test_shell).exception_name)
+
+    def test_stop(self):
+        test_shell = _create_shell()
+        test_shell.input_q.put("fg_com.print_info('last')")
+        test_shell.stop()
+        test_shell.join(10)
+        self.assertFalse(test_shell.is_alive())
+        self.assertEqual("last", self.get_message(test_shell).content)
+        self.assertEqual([], test_shell.shell_server.shell_list)
+
+    def test_run_script(self):
+        shell_server = _create_shell_server()
+        script_string = "fg_com.print_info('hello')\nfg_com.print_info('world')\n"
+        with tempfile.NamedTemporaryFile("w", suffix=".jts", delete=False) as script_file:
+            script_file.write(script_string)
+        self.addCleanup(os.remove, script_file.name)
+        output_queue = queue.Queue()
+        script_shell = shell.ShellServer.run_script(shell_server, script_file.name, output_queue)
+        # the messages are streamed to the given queue while the script is running
+        self.assertEqual(["hello", "world"], [output_queue.get(timeout=10).content for _ in range(2)])
+        script_shell.join(10)
+        self.assertFalse(script_shell.is_alive())
+        self.assertEqual([], shell_server.shell_list)
+        self.assertNotIn(script_string, execute.CODE_CACHE)
+
+    def test_reload_commands_error(self):
+        test_shell = self.start_shell()
+        shell_server = test_shell.shell_server
+        shell_server.command_reference_dictionary.reload_modules = lambda module_names: {
+            module_name: SyntaxError("invalid syntax") for module_name in module_names}
+        shell.ShellServer.reload_commands(shell_server, {"broken.py"})
+        # the modules, that could not be reloaded, are reported to the running shells
+        message = self.get_message(test_shell)
+        self.assertIsInstance(message, datamanage.ErrorMessage)
+        self.assertEqual("The command module 'broken' could not be reloaded: invalid syntax", message.content)
+
+    def test_persistent_namespace(self):
+        for worker_process in (False, True):
+            test_shell = self.start_shell(persistent_namespace=True, worker_process=worker_process)
+            # the translation of the 'print' command, binding the command module under the name of the builtin
+            test_shell.input_q.put("import JTSv2.commands.print as print\nprint.main(fg_com, 'command')\nx = 1")
+            self.assertEqual("command", self.get_message(test_shell).content)
+            # the assigned names stay defined, whereas the command module does not hide the builtin anymore
+            test_shell.input_q.put("fg_com.print_info(str((x, callable(print))))")
+            self.assertEqual("(1, True)", self.get_message(test_shell).content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+__author__ = 'Jonas'
+import unittest
+import JTSv2.lib.timingutil as timingutil
+
+
+class TestTimingUtil(unittest.TestCase):
+
+    def test_latency_recorder(self):
+        latency_recorder = timingutil.LatencyRecorder(max_entries=100)
+        for index in range(1, 201):
+            latency_recorder.record(str(index), {"exec": index / 1000, "total": index / 100})
+        # only the last 100 inputs are kept
+        self.assertEqual(100, len(latency_recorder))
+        self.assertEqual(200, latency_recorder.count)
+
+        percentile_dict = latency_recorder.percentiles()
+        self.assertEqual(["exec", "total"], list(percentile_dict.keys()))
+        self.assertEqual((0.15, 0.195, 0.199), tuple(percentile_dict["exec"][key] for key in ("p50", "p95", "p99")))
+        self.assertEqual(["200", "199"], [input_string for _, input_string, _ in latency_recorder.slowest(2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,19 @@
 __author__ = 'Jonas'
 import unittest
+import tempfile
 import timeit
+import types
+import os
+import sys
+import importlib
+import threading
+import concurrent.futures
+import configparser
 import JTSv2.lib.stringutil as strops
+import JTSv2.lib.cacheutil as cacheutil
 import JTSv2.translate as translate
+import JTSv2.execute as execute
+import JTSv2.commands as command_package
 
 
 class TestStringUtil(unittest.TestCase):
@@ -27,6 +38,26 @@ class TestStringUtil(unittest.TestCase):
         string = "a('Hallo') and b('''a('hallo')''')"
         self.assertEqual("X and b('''a('hallo')''')",strops.replace_ignore_in_quotationmarks(string, "a('Hallo')", "X"))
 
+    def test_replace_multiple_ignore_quotationmarks(self):
+        string = "$a + $ab + '$a'"
+        self.assertEqual("A + AB + '$a'",
+                         strops.replace_multiple_ignore_in_quotationmarks(string, {"$a": "A", "$ab": "AB"}))
+
+        string = "a('Hallo') and b('''a('hallo')''')"
+        self.assertEqual("X and Y('''a('hallo')''')",
+                         strops.replace_multiple_ignore_in_quotationmarks(string, {"a('Hallo')": "X", "b(": "Y("}))
+
+    def test_get_string_spans(self):
+        string = "print('a' + b)"
+        self.assertEqual([(0, 6, False), (6, 9, True), (9, 14, False)], strops.get_string_spans(string))
+
+        # the escaped quotation mark and the unterminated one in the comment
+        string = r"a = 'it\'s' # it's"
+        self.assertEqual([(0, 4, False), (4, 11, True), (11, 18, False)], strops.get_string_spans(string))
+
+        string = r"""r'\'' + "x\"y" """
+        self.assertEqual(["r", r"'\''", " + ", r'"x\"y"', " "], strops.split_string_structures(string))
+
 
 class TestTranslate(unittest.TestCase):
 
@@ -70,3 +101,252 @@ class TestTranslate(unittest.TestCase):
         self.assertEqual(result, translate._translate_commands(string, command_reference))
 
 
+
+    def test_tokenize(self):
+        string = "!cmd($a, 'b')"
+        self.assertEqual([("background", "!"), ("name", "cmd"), ("open", "("), ("variable", "$a"), ("other", ", "),
+                          ("string", "'b'"), ("close", ")")], list(translate._tokenize(string)))
+
+    def test_translate_single_pass(self):
+        command_dict = {"cmd1": "mod1", "cmd2": "mod2"}
+
+        string = "cmd2(cmd2($a)) and x.cmd1('cmd1()') and ?cmd1()"
+        result = ("import JTSv2.commands.mod2 as mod2\n"
+                  "mod2.main(fg_com,mod2.main(fg_com,EnV['a'])) and x.cmd1('cmd1()') and help('''mod1''')")
+        self.assertEqual(result, translate._translate_single_pass(string, command_dict))
+
+        string = "!cmd1(cmd2('hello'))"
+        result = "background(shell, {!r})".format("import JTSv2.commands.mod1 as mod1\n"
+                                                  "import JTSv2.commands.mod2 as mod2\n"
+                                                  "mod1.main(bg_com,mod2.main(bg_com,'hello'))")
+        self.assertEqual(result, translate._translate_single_pass(string, command_dict))
+
+    def test_replace_shell_syntax(self):
+        string = "!cmd1($a) and ?cmd2() and !x and '$b'"
+        self.assertEqual("__jts_background__cmd1(EnV['a']) and __jts_help__cmd2() and !x and '$b'",
+                         translate._replace_shell_syntax(string, {"cmd1": "mod1", "cmd2": "mod2"}))
+
+    def test_hoist_environmental_variables(self):
+        string = "for i in range(3):\n    $a += i * $b\nprint($c)\nf = lambda: $b"
+        code = translate._translate_syntax_tree(string, {}, hoist_variables=True)
+        # '$b' is also used within the lambda and '$c' outside of the loop, so only '$a' is hoisted
+        self.assertEqual({"_EnV_a"}, {name for name in code.co_names if name.startswith("_EnV_")})
+        environmental_variables = {"a": 1, "b": 2, "c": 3}
+        namespace = {"EnV": environmental_variables, "print": lambda value: None}
+        exec(code, namespace)
+        self.assertEqual(7, environmental_variables["a"])
+        self.assertEqual(set(), {name for name in namespace if name.startswith("_EnV")})
+
+    def test_hoist_undefined_environmental_variables(self):
+        code = translate._translate_syntax_tree("for i in range(3):\n    $a = i + $b", {}, hoist_variables=True)
+        # an undefined variable raises the same KeyError as without the hoisting and no local names are left
+        namespace = {"EnV": {}}
+        with self.assertRaises(KeyError) as context:
+            exec(code, namespace)
+        self.assertEqual(("b",), context.exception.args)
+        self.assertEqual({"EnV"}, {name for name in namespace if name.startswith("EnV") or name.startswith("_EnV")})
+
+        environmental_variables = {"b": 10}
+        namespace = {"EnV": environmental_variables}
+        exec(code, namespace)
+        self.assertEqual(12, environmental_variables["a"])
+        self.assertEqual({"EnV"}, {name for name in namespace if name.startswith("EnV") or name.startswith("_EnV")})
+
+        # the undefined variables only raise, where they are actually read
+        for string in ("for f in []:\n    $out = $prefix + f", "if False:\n    for i in range(3):\n        $missing"):
+            environmental_variables = {}
+            exec(translate._translate_syntax_tree(string, {}, hoist_variables=True), {"EnV": environmental_variables})
+            self.assertEqual({}, environmental_variables)
+
+        # the statements before the first read of the undefined variable still have their effects
+        environmental_variables = {}
+        code = translate._translate_syntax_tree("$before = 1\nfor i in range(3):\n    $a += 1", {},
+                                                hoist_variables=True)
+        with self.assertRaises(KeyError) as context:
+            exec(code, {"EnV": environmental_variables})
+        self.assertEqual(("a",), context.exception.args)
+        self.assertEqual({"before": 1}, environmental_variables)
+
+    def test_inject_modules(self):
+        # the command module 'stats' has the same name as the variable of the user
+        command_dict = {"cmd": "mod1", "stats": "stats"}
+        string = "stats = 3\nx = cmd(stats) + len([help])"
+        self.assertEqual(("stats = 3\nx = mod1.main(fg_com,stats) + len([help])", frozenset({"mod1"})),
+                         translate._translate_single_pass(string, command_dict, inject_modules=True))
+        code, module_names = translate._translate_syntax_tree(string, command_dict, inject_modules=True)
+        self.assertEqual(frozenset({"mod1"}), module_names)
+
+        # only the modules of the translated calls are injected, the names assigned by the user are left alone
+        modules = {"mod1": types.SimpleNamespace(main=lambda com, value: value * 2), "stats": types.SimpleNamespace()}
+        command_reference_dictionary = types.SimpleNamespace(
+            resolve_modules=lambda names: {name: modules[name] for name in names})
+        shell = types.SimpleNamespace(namespace={}, persistent_namespace=True, fg_com=None, env_variable_container={},
+                                      process_list=None, inject_modules=True,
+                                      shell_server=types.SimpleNamespace(
+                                          command_reference_dictionary=command_reference_dictionary))
+        execute.execute(shell, (code, module_names))
+        self.assertEqual(3, shell.namespace["stats"])
+        self.assertEqual(7, shell.namespace["x"])
+
+    def test_command_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "cmd.py"), "w") as file:
+                file.write("def main(shell):\n    \"\"\"The doc\"\"\"\n")
+            with open(os.path.join(directory, "util.py"), "w") as file:
+                file.write("def helper():\n    pass\n")
+            with open(os.path.join(directory, "command reference.ini"), "w") as file:
+                file.write("[Commands]\nalias = cmd\n")
+
+            manifest = translate.CommandManifest(directory)
+            self.assertTrue(manifest.scan())
+            self.assertFalse(manifest.scan())
+            self.assertEqual({"cmd": "cmd", "alias": "cmd"}, manifest.get_commands())
+            # the doc strings are only parsed, once they are requested
+            self.assertNotIn("doc", manifest.modules["cmd"])
+            self.assertEqual("The doc", manifest.get_doc("cmd"))
+            self.assertIsNone(manifest.get_doc("util"))
+            self.assertEqual("The doc", translate.CommandManifest(directory).modules["cmd"]["doc"])
+
+            with manifest.batch():
+                manifest.add_alias("other", "cmd")
+                self.assertNotIn("other", translate.CommandManifest(directory).aliases)
+            self.assertEqual("The doc", translate.CommandManifest(directory).get_doc("cmd"))
+            self.assertIn("other", translate.CommandManifest(directory).aliases)
+
+            # the aliases removed from the file are removed from the manifest, the ones added at runtime are kept
+            with open(os.path.join(directory, "command reference.ini"), "w") as file:
+                file.write("[Commands]\nrenamed = cmd\n")
+            os.utime(os.path.join(directory, "command reference.ini"), ns=(0, 0))
+            self.assertTrue(manifest.scan())
+            self.assertEqual({"cmd": "cmd", "renamed": "cmd", "other": "cmd"}, manifest.get_commands())
+            os.remove(os.path.join(directory, "command reference.ini"))
+            self.assertTrue(manifest.scan())
+            self.assertEqual({"cmd": "cmd", "other": "cmd"}, manifest.get_commands())
+
+    def test_command_reference_runtime_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for module_name in ("cmd1", "cmd2"):
+                with open(os.path.join(directory, "{}.py".format(module_name)), "w") as file:
+                    file.write("def main(shell):\n    pass\n")
+
+            command_reference = translate.CommandReferenceDictionary([directory])
+            snapshot = command_reference.snapshot
+            self.assertEqual({"cmd1": "cmd1", "cmd2": "cmd2"}, dict(snapshot.dict))
+
+            # every change creates a new snapshot, the old one stays untouched
+            command_reference["other"] = "cmd1"
+            del command_reference["cmd2"]
+            self.assertEqual({"cmd1": "cmd1", "cmd2": "cmd2"}, dict(snapshot.dict))
+            self.assertEqual(snapshot.generation + 2, command_reference.generation)
+            with self.assertRaises(TypeError):
+                snapshot.dict["cmd3"] = "cmd3"
+            self.assertRaises(KeyError, command_reference.__delitem__, "cmd2")
+
+            # a new scan picks up the new module, but keeps the changes made at runtime
+            with open(os.path.join(directory, "cmd3.py"), "w") as file:
+                file.write("def main(shell):\n    pass\n")
+            self.assertTrue(command_reference.discover())
+            self.assertEqual({"cmd1": "cmd1", "cmd3": "cmd3", "other": "cmd1"}, dict(command_reference.dict))
+            self.assertFalse(command_reference.discover())
+
+            command_reference.clear()
+            command_reference["cmd4"] = "cmd1"
+            command_reference.discover()
+            self.assertEqual({"cmd4": "cmd1"}, dict(command_reference.dict))
+
+    def test_reload_command_modules(self):
+        with tempfile.TemporaryDirectory() as directory:
+            module_path = os.path.join(directory, "reloaded_cmd.py")
+            with open(module_path, "w") as file:
+                file.write("VERSION = 1\n\ndef main(shell, event):\n    event.wait(10)\n    return VERSION\n")
+            command_reference = translate.CommandReferenceDictionary([directory])
+            self.addCleanup(sys.modules.pop, "JTSv2.commands.reloaded_cmd", None)
+            old_module = importlib.import_module("JTSv2.commands.reloaded_cmd")
+
+            # a command of the old module is still running while the module is reloaded
+            event = threading.Event()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(old_module.main, None, event)
+                with open(module_path, "w") as file:
+                    file.write("VERSION = 2\n\ndef main(shell, event):\n    return VERSION\n")
+                os.utime(module_path, ns=(0, 0))
+                self.assertEqual({}, command_reference.reload_modules(["reloaded_cmd"]))
+                event.set()
+                self.assertEqual(1, future.result(10))
+            new_module = importlib.import_module("JTSv2.commands.reloaded_cmd")
+            self.assertIsNot(old_module, new_module)
+            self.assertEqual((1, 2), (old_module.VERSION, new_module.main(None, None)))
+            self.assertEqual(1, command_reference.reload_count)
+
+            # a module, that can not be loaded, keeps its old version
+            with open(module_path, "w") as file:
+                file.write("def main(shell:\n")
+            error_dict = command_reference.reload_modules(["reloaded_cmd"])
+            self.assertIsInstance(error_dict["reloaded_cmd"], SyntaxError)
+            self.assertIs(new_module, importlib.import_module("JTSv2.commands.reloaded_cmd"))
+
+    def test_command_directories(self):
+        config_parser = configparser.ConfigParser()
+        config_parser.read_dict({"Paths": {"project_dir": "/project", "commands_dir": "%(project_dir)s/commands",
+                                           "command_search_path": "\n/shared/commands\nuser commands"}})
+        self.assertEqual(["/project/commands", "/shared/commands", "/project/user commands"],
+                         translate.get_command_directories(config_parser, "/project"))
+
+        with tempfile.TemporaryDirectory() as first_directory, tempfile.TemporaryDirectory() as second_directory:
+            for directory, module_names in ((first_directory, ("shared_cmd", "first_cmd")),
+                                            (second_directory, ("shared_cmd", "second_cmd"))):
+                for module_name in module_names:
+                    with open(os.path.join(directory, "{}.py".format(module_name)), "w") as file:
+                        file.write("DIRECTORY = {!r}\n\ndef main(shell):\n    pass\n".format(directory))
+                with open(os.path.join(directory, "command reference.ini"), "w") as file:
+                    file.write("[Commands]\nalias = {}\n".format(module_names[1]))
+
+            missing_directory = os.path.join(second_directory, "missing")
+            with self.assertWarns(UserWarning):
+                command_reference = translate.CommandReferenceDictionary([first_directory, second_directory,
+                                                                          missing_directory])
+            # the commands of all the directories are merged, the earlier directory takes precedence
+            self.assertEqual({"shared_cmd": "shared_cmd", "first_cmd": "first_cmd", "second_cmd": "second_cmd",
+                              "alias": "first_cmd"}, dict(command_reference.dict))
+
+            # the directories are appended to the search path of the commands package in the order of their precedence
+            package_path = list(command_package.__path__)
+            self.assertLess(package_path.index(first_directory), package_path.index(second_directory))
+            command_package.extend_path([first_directory])
+            self.assertEqual(package_path, list(command_package.__path__))
+            for module_name, directory in (("shared_cmd", first_directory), ("second_cmd", second_directory)):
+                self.addCleanup(sys.modules.pop, "JTSv2.commands.{}".format(module_name), None)
+                self.assertEqual(directory, importlib.import_module("JTSv2.commands.{}".format(module_name)).DIRECTORY)
+
+    def test_translation_cache(self):
+        command_reference = types.SimpleNamespace(generation=0,
+                                                  snapshot=translate.CommandSnapshot.create(0, {"cmd": "mod1"}))
+        translation_cache = translate.TranslationCache(command_reference, max_size=2)
+        translation = translation_cache.translate("cmd()")
+        self.assertIs(translation, translation_cache.translate("cmd()"))
+        self.assertEqual(1, translation_cache.statistics()["hits"])
+
+        # a new generation of the commands invalidates the cached translations
+        command_reference.snapshot = translate.CommandSnapshot.create(1, {"cmd": "mod2"})
+        self.assertEqual("import JTSv2.commands.mod2 as mod2\nmod2.main(fg_com,)", translation_cache.translate("cmd()"))
+        self.assertEqual(1, translation_cache.statistics()["size"])
+
+    def test_persistent_translation_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk_cache = cacheutil.DiskCache(directory)
+            command_reference = types.SimpleNamespace(generation=0,
+                                                      snapshot=translate.CommandSnapshot.create(0, {"cmd": "mod1"}))
+            translation = translate.TranslationCache(command_reference, disk_cache=disk_cache).translate("cmd()")
+            disk_cache.flush()
+            self.assertEqual({"max_entries": 1024, "hits": 0, "misses": 1}, disk_cache.statistics())
+
+            # a new translation cache (as after a restart) takes the translation from the disk
+            self.assertEqual(translation, translate.TranslationCache(command_reference, disk_cache=disk_cache)
+                             .translate("cmd()"))
+            self.assertEqual(1, disk_cache.statistics()["hits"])
+
+            # different commands have a different fingerprint, so the persisted translation is not used anymore
+            command_reference.snapshot = translate.CommandSnapshot.create(1, {"cmd": "mod2"})
+            self.assertEqual("import JTSv2.commands.mod2 as mod2\nmod2.main(fg_com,)",
+                             translate.TranslationCache(command_reference, disk_cache=disk_cache).translate("cmd()"))
+            self.assertEqual(2, disk_cache.statistics()["misses"])
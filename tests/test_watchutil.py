@@ -0,0 +1,61 @@
+__author__ = 'Jonas'
+import unittest
+import tempfile
+import queue
+import os
+import JTSv2.lib.watchutil as watchutil
+
+
+class TestWatchUtil(unittest.TestCase):
+
+    def start_watcher(self, directory, use_inotify, **kwargs):
+        changes_queue = queue.Queue()
+        watcher = watchutil.DirectoryWatcher(directory, changes_queue.put, interval=0.05, settle_time=0.05, **kwargs)
+        if not use_inotify:
+            watcher.use_inotify = False
+        elif not watcher.use_inotify:
+            self.skipTest("inotify is not available")
+        watcher.start()
+        self.addCleanup(watcher.join, 5)
+        self.addCleanup(watcher.stop)
+        return watcher, changes_queue
+
+    def check_changes(self, use_inotify):
+        with tempfile.TemporaryDirectory() as directory:
+            watcher, changes_queue = self.start_watcher(directory, use_inotify)
+            self.assertEqual(use_inotify, watcher.use_inotify)
+            for file_name in ("cmd.py", "notes.txt"):
+                with open(os.path.join(directory, file_name), "w") as file:
+                    file.write("def main(shell):\n    pass\n")
+            # only the files with the watched extensions are reported
+            self.assertEqual({"cmd.py"}, changes_queue.get(timeout=5))
+
+            os.remove(os.path.join(directory, "cmd.py"))
+            self.assertEqual({"cmd.py"}, changes_queue.get(timeout=5))
+            watcher.stop()
+
+    def test_inotify(self):
+        self.check_changes(True)
+
+    def test_polling(self):
+        self.check_changes(False)
+
+    def test_callback_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            error_queue = queue.Queue()
+            watcher = watchutil.DirectoryWatcher(directory, lambda changed_names: 1 / 0, interval=0.05,
+                                                 settle_time=0.05, error_callback=error_queue.put)
+            watcher.start()
+            self.addCleanup(watcher.join, 5)
+            self.addCleanup(watcher.stop)
+            for file_name in ("cmd1.py", "cmd2.py"):
+                with open(os.path.join(directory, file_name), "w") as file:
+                    file.write("def main(shell):\n    pass\n")
+                # the watcher keeps running after the callback has failed
+                self.assertIsInstance(error_queue.get(timeout=5), ZeroDivisionError)
+                self.assertTrue(watcher.is_alive())
+            watcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,621 @@
 __author__ = 'Jonas'
 import re
+import ast
 import os
-import pickle
-import inspect
 import importlib
+import importlib.machinery
+import importlib.util
+import sys
 import configparser
+import threading
+import json
+import contextlib
+import collections
+import types
+import hashlib
+import warnings
 import JTSv2.execute as execute
+import JTSv2.commands as command_package
 import JTSv2.lib.stringutil as stringops
+import JTSv2.lib.cacheutil as cacheutil
 
 
 ILLEGAL_CHARACTERS_FUNCTION_NOMENCLATURE = [" ", ",", ".", "-", "+"]
 
+# The patterns of the command calls and environmental variables, as used by the string based search functions
+COMMAND_NAME_PATTERN = re.compile(r"""[^().,\-+"'#*'\s]*\(""")
+ENVIRONMENTAL_VARIABLE_PATTERN = re.compile(r"""\$[^'".,()\-+\s=;:]+""")
+# The pattern of the definition of a 'main' function on the top level of a module, which makes the module a command
+MAIN_FUNCTION_PATTERN = re.compile(r"^(?:async\s+)?def\s+main\s*\(", re.MULTILINE)
+
+# The format of the import statement, that is put in front of the translated string for every command module used
+IMPORT_STATEMENT_FORMAT = "import JTSv2.commands.{0} as {0}\n"
+
+# The types of the tokens, the shell input is being split into by the '_tokenize' function
+TOKEN_STRING = "string"
+TOKEN_COMMENT = "comment"
+TOKEN_VARIABLE = "variable"
+TOKEN_NAME = "name"
+TOKEN_BACKGROUND = "background"
+TOKEN_HELP = "help"
+TOKEN_OPEN = "open"
+TOKEN_CLOSE = "close"
+TOKEN_OTHER = "other"
+
+# The prefixes, that can be put in front of a python string structure (compared in lower case)
+STRING_PREFIXES = ["r", "u", "b", "f", "br", "rb", "fr", "rf"]
+
+# The modes of the translation: either the translated python source code or the already compiled code object
+MODE_SOURCE = "source"
+MODE_CODE = "code"
+
+# The prefixes of the placeholder names, the background '!' and help '?' commands are replaced with, before the input
+# is parsed as python syntax tree
+BACKGROUND_PLACEHOLDER = "__jts_background__"
+HELP_PLACEHOLDER = "__jts_help__"
+
+# The hash of the source code of the translator itself, which is part of the key of the persisted translations, so that
+# the translations of another version of the translator are never used
+with open(__file__, "rb") as _file:
+    TRANSLATOR_HASH = hashlib.sha256(_file.read()).hexdigest()
+
+# The format of the local names, the environmental variables are bound to, when they are hoisted out of loops, the
+# name of the object marking the variables, that were undefined before the execution, and the format of the expression,
+# that reads a hoisted variable, falling back to the container as long as the local name is bound to the marker
+HOISTED_VARIABLE_FORMAT = "_EnV_{}"
+HOISTED_UNDEFINED = "_EnV"
+HOISTED_LOAD_FORMAT = "({0} if {0} is not {1} else EnV[{2!r}])"
+
+
+def translate(input_str, commandreferencedictionary, mode=MODE_SOURCE, inject_modules=False, hoist_variables=False):
+    """
+    Translates the string of the terminal input, which is written in the python-ish shell language, into pure python
+    code. The environmental variables '$name' are translated into accessing the 'EnV' container and the command calls
+    (including the exclamation mark '!' and question mark '?' syntax) into calls of the main functions of their
+    modules, with the necessary import statements put in front of the code.
+    In the source mode the whole input is translated within one single scan, see '_translate_single_pass'. In the code
+    mode the input is parsed into a python syntax tree instead, which is then translated and compiled directly, see
+    '_translate_syntax_tree'.
+    In case the modules are injected, the import statements are left out of the translation, as the command modules
+    will be part of the namespace the code is executed in. The names of the modules, that have to be injected, are
+    then returned together with the translation, so that no other name of the namespace is replaced by a module.
+    Background commands keep their imports, as they are being executed by a separate process.
+    In the code mode the environmental variables, that are used within loops, can additionally be hoisted out of those
+    loops, see '_hoist_environmental_variables'.
 
-def translate(input_str, commandreferencedictionary):
-    translated_string = _translate_environmental_variables(input_str)
-    translated_string = _translate_commands(translated_string, commandreferencedictionary)
-    return translated_string
+    :param input_str: (string) the terminal input issued by the user
+    :param commandreferencedictionary: (CommandReferenceDictionary/CommandSnapshot) the reference of the command names
+    to modules
+    :param mode: (string) MODE_SOURCE on default, MODE_CODE for the compiled code object
+    :param inject_modules: (boolean) whether the command modules are injected into the execution namespace instead of
+    being imported. False on default
+    :param hoist_variables: (boolean) whether the environmental variables are hoisted out of loops, only in the code
+    mode. False on default
+    :return: (string/code/tuple) the translated python code, in case the modules are injected the tuple of the
+    translated code and the frozenset of the names of the modules used by the foreground commands
+    """
+    if mode == MODE_CODE:
+        return _translate_syntax_tree(input_str, commandreferencedictionary.dict, inject_modules, hoist_variables)
+    return _translate_single_pass(input_str, commandreferencedictionary.dict, inject_modules)
+
+
+def _tokenize(input_string):
+    """
+    A generator, that splits the string of a terminal input into the tokens, that matter for the translation of the
+    shell language, within a single scan over the string. Every character of the input is part of exactly one token,
+    so joining the token strings results in the input string again. The generated items are tuples of the token type
+    (one of the TOKEN constants of this module) and the token string:
+    - TOKEN_STRING: a whole python string structure including the quotation marks and a possible prefix
+    - TOKEN_COMMENT: a comment up until the end of the line
+    - TOKEN_VARIABLE: a environmental variable name including the dollar '$' prefix
+    - TOKEN_NAME: a python identifier
+    - TOKEN_BACKGROUND, TOKEN_HELP: a exclamation mark '!' or question mark '?' directly in front of a identifier
+    - TOKEN_OPEN, TOKEN_CLOSE: a opening or closing bracket
+    - TOKEN_OTHER: everything in between
+
+    EXAMPLE:
+    "!cmd($a, 'b')"
+    > [("background", "!"), ("name", "cmd"), ("open", "("), ("variable", "$a"), ("other", ", "),
+       ("string", "'b'"), ("close", ")")]
+
+    :param input_string: (string) the terminal input issued by the user
+    :return: (generator) the (token type, token string) tuples
+    """
+    length = len(input_string)
+    index = 0
+    # the start index of the current run of characters, that do not belong to any special token
+    run_start = 0
+    while index < length:
+        character = input_string[index]
+        token_type = None
+        end = index + 1
+
+        if character == "'" or character == '"':
+            token_type = TOKEN_STRING
+            end = stringops.find_string_end(input_string, index)
+            if end == -1:
+                end = length
+        elif character == "#":
+            token_type = TOKEN_COMMENT
+            end = input_string.find("\n", index)
+            if end == -1:
+                end = length
+        elif character.isalpha() or character == "_":
+            token_type = TOKEN_NAME
+            end = _find_name_end(input_string, index + 1)
+            # the identifier could also be the prefix of a string structure like r'raw' or f'format'
+            if end < length and (input_string[end] == "'" or input_string[end] == '"') and \
+                    input_string[index:end].lower() in STRING_PREFIXES:
+                token_type = TOKEN_STRING
+                end = stringops.find_string_end(input_string, end)
+                if end == -1:
+                    end = length
+        elif character.isdigit():
+            # consuming the whole number literal, so that something like '1e5' does not produce the identifier 'e5'
+            index = _find_name_end(input_string, index + 1)
+            continue
+        elif character == "$" or character == "!" or character == "?":
+            name_end = _find_name_end(input_string, index + 1)
+            if name_end > index + 1 and not input_string[index + 1].isdigit():
+                if character == "$":
+                    token_type = TOKEN_VARIABLE
+                    end = name_end
+                else:
+                    token_type = TOKEN_BACKGROUND if character == "!" else TOKEN_HELP
+        elif character == "(":
+            token_type = TOKEN_OPEN
+        elif character == ")":
+            token_type = TOKEN_CLOSE
+
+        if token_type is None:
+            index += 1
+            continue
+        if run_start < index:
+            yield TOKEN_OTHER, input_string[run_start:index]
+        yield token_type, input_string[index:end]
+        index = end
+        run_start = end
+
+    if run_start < length:
+        yield TOKEN_OTHER, input_string[run_start:length]
+
+
+def _find_name_end(input_string, index):
+    """
+    Returns the index of the first character starting from the given index, that can not be part of a python identifier
+    :param input_string: (string) the string to search in
+    :param index: (int) the index at which to start
+    :return: (int)
+    """
+    length = len(input_string)
+    while index < length:
+        character = input_string[index]
+        if not(character.isalnum() or character == "_"):
+            break
+        index += 1
+    return index
+
+
+class _TranslationFrame:
+    """
+    The state of a part of the single pass translation, that has to be translated as a whole, as soon as its closing
+    bracket is found. The base frame is the whole input, additional frames are opened for the background and help
+    commands, whose whole call has to be wrapped by the 'background' and 'help' functions.
+
+    :ivar kind: (string) TOKEN_BACKGROUND, TOKEN_HELP or None for the base frame
+
+    :ivar module_name: (string) the name of the module of the command, that opened the frame
+
+    :ivar com_name: (string) the name of the ShellCom object, that is passed to the commands inside the frame
+
+    :ivar depth: (int) the amount of opened and not yet closed brackets inside the frame
+
+    :ivar output: (list) the translated strings of the frame
+
+    :ivar modules: (set) the names of the modules, that have to be imported for the commands used inside the frame
+    """
+    def __init__(self, kind, module_name, com_name):
+        self.kind = kind
+        self.module_name = module_name
+        self.com_name = com_name
+        self.depth = 0
+        self.output = []
+        self.modules = set()
+
+    def get_imports_string(self):
+        return ''.join(IMPORT_STATEMENT_FORMAT.format(module_name) for module_name in sorted(self.modules))
+
+
+def _translate_single_pass(input_string, command_dict, inject_modules=False):
+    """
+    Translates the string of the terminal input into python code within one single scan over the input, unlike the
+    combination of the '_translate_environmental_variables' and '_translate_commands' functions, which issue another
+    replacement pass over the whole string for every variable and command found.
+    The tokens of the input are emitted one after another, replacing the environmental variables with the access of the
+    'EnV' container and the command calls with the calls of their module's main function. The background '!' and help
+    '?' commands open a new frame, that collects the translation until the matching closing bracket of the command
+    call, upon which the whole call is wrapped into the 'background' or 'help' call.
+
+    EXAMPLE:
+    "cmd2(cmd2($a)) and ?cmd1()"
+    > "import JTSv2.commands.mod2 as mod2
+       mod2.main(fg_com,mod2.main(fg_com,EnV['a'])) and help('''mod1''')"
+
+    :param input_string: (string) the terminal input issued by the user
+    :param command_dict: (dict) the dictionary assigning the command names to their module names
+    :param inject_modules: (boolean) whether the import statements for the foreground commands are left out
+    :return: (string/tuple) the translated python code, in case the modules are injected the tuple of the code and the
+    frozenset of the names of the modules used by the foreground commands
+    """
+    tokens = list(_tokenize(input_string))
+    frames = [_TranslationFrame(None, None, "fg_com")]
+
+    index = 0
+    while index < len(tokens):
+        token_type, token_string = tokens[index]
+        frame = frames[-1]
+
+        if token_type == TOKEN_VARIABLE:
+            frame.output.append("EnV['{}']".format(token_string[1:]))
+
+        elif token_type == TOKEN_NAME:
+            prefix_type = None
+            if index > 0 and tokens[index - 1][0] in (TOKEN_BACKGROUND, TOKEN_HELP):
+                prefix_type = tokens[index - 1][0]
+            # A command call is a identifier, that is registered as command, directly followed by the bracket and not
+            # being the attribute of some other object
+            is_attribute = prefix_type is None and index > 0 and tokens[index - 1][0] == TOKEN_OTHER and \
+                tokens[index - 1][1].rstrip().endswith(".")
+            is_call = index + 1 < len(tokens) and tokens[index + 1][0] == TOKEN_OPEN
+
+            module_name = command_dict.get(token_string) if is_call and not is_attribute else None
+            if module_name is not None:
+                if prefix_type is None:
+                    frame.modules.add(module_name)
+                    frame.output.append("{}.main({},".format(module_name, frame.com_name))
+                    frame.depth += 1
+                else:
+                    # the prefix has already been added to the output of the frame, but it is not part of the
+                    # translation
+                    frame.output.pop()
+                    frame = _TranslationFrame(prefix_type, module_name, "bg_com")
+                    frame.depth = 1
+                    frames.append(frame)
+                    if prefix_type == TOKEN_BACKGROUND:
+                        frame.modules.add(module_name)
+                        frame.output.append("{}.main(bg_com,".format(module_name))
+                # skipping the opening bracket, as it is already part of the translation
+                index += 1
+            else:
+                frame.output.append(token_string)
+
+        elif token_type == TOKEN_OPEN:
+            frame.depth += 1
+            frame.output.append(token_string)
+
+        elif token_type == TOKEN_CLOSE:
+            frame.depth -= 1
+            frame.output.append(token_string)
+            if frame.kind is not None and frame.depth == 0:
+                # The call of the background or help command is complete, wrapping it into the according function call
+                frames.pop()
+                if frame.kind == TOKEN_BACKGROUND:
+                    execution_statement = ''.join([frame.get_imports_string()] + frame.output)
+                    frames[-1].output.append("background(shell, {!r})".format(execution_statement))
+                else:
+                    frames[-1].output.append("help('''{}''')".format(frame.module_name))
+
+        else:
+            frame.output.append(token_string)
+
+        index += 1
+
+    # In case there are unclosed command calls left, their translation is passed on to the base frame as it is, the
+    # compilation will point out the syntax error
+    while len(frames) > 1:
+        frame = frames.pop()
+        frames[-1].modules.update(frame.modules)
+        frames[-1].output += frame.output
+
+    if inject_modules:
+        return ''.join(frames[0].output), frozenset(frames[0].modules)
+    return ''.join([frames[0].get_imports_string()] + frames[0].output)
+
+
+def _replace_shell_syntax(input_string, command_dict):
+    """
+    Replaces only those parts of the shell language, that are not valid python syntax: The environmental variables
+    '$name' are translated into accessing the 'EnV' container and the exclamation mark '!' and question mark '?'
+    prefixes of command calls are translated into placeholder names, so that the result can be parsed by the 'ast'
+    module.
+
+    EXAMPLE:
+    "!cmd1($a) and ?cmd2()"
+    > "__jts_background__cmd1(EnV['a']) and __jts_help__cmd2()"
+
+    :param input_string: (string) the terminal input issued by the user
+    :param command_dict: (dict) the dictionary assigning the command names to their module names
+    :return: (string) the python-parsable string
+    """
+    string_list = []
+    prefix = None
+    for token_type, token_string in _tokenize(input_string):
+        if token_type == TOKEN_VARIABLE:
+            string_list.append("EnV['{}']".format(token_string[1:]))
+        elif token_type == TOKEN_BACKGROUND or token_type == TOKEN_HELP:
+            prefix = token_string
+            continue
+        elif prefix is not None and token_type == TOKEN_NAME and token_string in command_dict:
+            placeholder = BACKGROUND_PLACEHOLDER if prefix == "!" else HELP_PLACEHOLDER
+            string_list.append(placeholder + token_string)
+        else:
+            if prefix is not None:
+                string_list.append(prefix)
+            string_list.append(token_string)
+        prefix = None
+    return ''.join(string_list)
+
+
+class _CommandCallTransformer(ast.NodeTransformer):
+    """
+    The NodeTransformer, that translates the calls of commands within the syntax tree of the terminal input into the
+    calls of the main functions of their modules, passing the ShellCom object as first argument. The calls of the
+    background and help placeholder names are translated into the calls of the 'background' and 'help' functions.
+
+    :ivar command_dict: (dict) the dictionary assigning the command names to their module names
+
+    :ivar com_name: (string) the name of the ShellCom object, that is passed to the commands
+
+    :ivar modules: (set) the names of the modules, that have to be imported for the translated commands
+    """
+    def __init__(self, command_dict, com_name):
+        super(_CommandCallTransformer, self).__init__()
+        self.command_dict = command_dict
+        self.com_name = com_name
+        self.modules = set()
+
+    def visit_Call(self, node):
+        name = node.func.id if isinstance(node.func, ast.Name) else ""
+
+        if name.startswith(BACKGROUND_PLACEHOLDER):
+            # The whole call is translated separately with the background ShellCom, as the process executing it will
+            # need the python source code including its own imports
+            node.func.id = name[len(BACKGROUND_PLACEHOLDER):]
+            background_transformer = _CommandCallTransformer(self.command_dict, "bg_com")
+            background_call = background_transformer.visit(node)
+            execution_statement = ''.join([''.join(IMPORT_STATEMENT_FORMAT.format(module_name) for module_name in
+                                                   sorted(background_transformer.modules)),
+                                           ast.unparse(background_call)])
+            return ast.copy_location(ast.Call(func=ast.Name(id="background", ctx=ast.Load()),
+                                              args=[ast.Name(id="shell", ctx=ast.Load()),
+                                                    ast.Constant(value=execution_statement)],
+                                              keywords=[]), node)
+
+        if name.startswith(HELP_PLACEHOLDER):
+            module_name = self.command_dict[name[len(HELP_PLACEHOLDER):]]
+            return ast.copy_location(ast.Call(func=ast.Name(id="help", ctx=ast.Load()),
+                                              args=[ast.Constant(value=module_name)],
+                                              keywords=[]), node)
+
+        self.generic_visit(node)
+        if name in self.command_dict:
+            module_name = self.command_dict[name]
+            self.modules.add(module_name)
+            node.func = ast.copy_location(ast.Attribute(value=ast.Name(id=module_name, ctx=ast.Load()),
+                                                        attr="main", ctx=ast.Load()), node.func)
+            node.args.insert(0, ast.Name(id=self.com_name, ctx=ast.Load()))
+        return node
+
+
+def _get_variable_name(node):
+    """
+    Returns the name of the environmental variable, in case the given node is the access of a variable of the 'EnV'
+    container with a constant name, as the '$name' syntax is being translated into, None otherwise
+    :param node: (ast.AST) the node of the syntax tree
+    :return: (string/None) the name of the variable
+    """
+    if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "EnV" and
+            isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+        return node.slice.value
+    return None
+
+
+class _EnvironmentalVariableAnalyzer(ast.NodeVisitor):
+    """
+    The NodeVisitor, that determines which environmental variables of a syntax tree can be hoisted out of the loops.
+    Those are the variables, that are accessed within a loop or comprehension at least once. The variables, that are
+    deleted or that are accessed from within a function, lambda or class body are excluded, as those bodies might be
+    executed after the values have been written back to the container.
+
+    :ivar loop_variables: (set) the names of the variables, that are accessed within loops
+
+    :ivar stored_variables: (set) the names of the variables, that are assigned to
+
+    :ivar excluded_variables: (set) the names of the variables, that must not be hoisted
+
+    :ivar dynamic_access: (boolean) whether the 'EnV' container is used in any other way than accessing a variable with
+    a constant name, in which case nothing can be hoisted, as the variables accessed that way are unknown
+    """
+    def __init__(self):
+        super(_EnvironmentalVariableAnalyzer, self).__init__()
+        self.loop_variables = set()
+        self.stored_variables = set()
+        self.excluded_variables = set()
+        self.dynamic_access = False
+
+        self._loop_depth = 0
+        self._scope_depth = 0
+
+    def get_hoistable_variables(self):
+        """
+        :return: (set) the names of the variables, that can be hoisted
+        """
+        if self.dynamic_access:
+            return set()
+        return self.loop_variables - self.excluded_variables
+
+    def visit_Subscript(self, node):
+        variable_name = _get_variable_name(node)
+        if variable_name is None:
+            self.generic_visit(node)
+            return
+
+        if isinstance(node.ctx, ast.Del) or self._scope_depth > 0:
+            self.excluded_variables.add(variable_name)
+        elif self._loop_depth > 0:
+            self.loop_variables.add(variable_name)
+        if isinstance(node.ctx, ast.Store):
+            self.stored_variables.add(variable_name)
+
+    def visit_Name(self, node):
+        if node.id == "EnV":
+            self.dynamic_access = True
+
+    def _visit_loop(self, node):
+        self._loop_depth += 1
+        self.generic_visit(node)
+        self._loop_depth -= 1
+
+    def _visit_scope(self, node):
+        self._scope_depth += 1
+        self.generic_visit(node)
+        self._scope_depth -= 1
+
+    visit_For = visit_AsyncFor = visit_While = _visit_loop
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_loop
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = visit_ClassDef = _visit_scope
+
+
+class _EnvironmentalVariableHoister(ast.NodeTransformer):
+    """
+    The NodeTransformer, that replaces the accesses of the hoisted environmental variables with the local names, the
+    variables are bound to, see '_hoist_environmental_variables'
+
+    :ivar variable_names: (set) the names of the hoisted variables
+    """
+    def __init__(self, variable_names):
+        super(_EnvironmentalVariableHoister, self).__init__()
+        self.variable_names = variable_names
+
+    def visit_Subscript(self, node):
+        variable_name = _get_variable_name(node)
+        if variable_name not in self.variable_names:
+            self.generic_visit(node)
+            return node
+
+        local_name = HOISTED_VARIABLE_FORMAT.format(variable_name)
+        if isinstance(node.ctx, ast.Store):
+            return ast.copy_location(ast.Name(id=local_name, ctx=ast.Store()), node)
+        # the variable is read from the container, as long as it has not been bound, so that it raises the KeyError
+        load_node = ast.parse(HOISTED_LOAD_FORMAT.format(local_name, HOISTED_UNDEFINED, variable_name),
+                              mode="eval").body
+        return ast.fix_missing_locations(ast.copy_location(load_node, node))
+
+    def visit_AugAssign(self, node):
+        variable_name = _get_variable_name(node.target)
+        self.generic_visit(node)
+        if variable_name not in self.variable_names:
+            return node
+
+        # the augmented assignment reads the local name directly, so it is bound from the container before, in case
+        # it is not bound yet, which raises the KeyError for an undefined variable
+        local_name = HOISTED_VARIABLE_FORMAT.format(variable_name)
+        bind_node = ast.parse("if {0} is {1}: {0} = EnV[{2!r}]".format(local_name, HOISTED_UNDEFINED,
+                                                                       variable_name)).body[0]
+        return [ast.fix_missing_locations(ast.copy_location(bind_node, node)), node]
+
+
+def _hoist_environmental_variables(tree):
+    """
+    Hoists the accesses of the environmental variables, that are used within loops, out of those loops: Every such
+    variable is bound to a local name once at the beginning of the execution, so that the loops access the local name
+    instead of calling the '__getitem__' of the 'EnV' container with every iteration. The variables, that are assigned
+    to, are written back to the container once at the end of the execution (even in case of an exception), so that the
+    container still notices the change and saves the variable. The value is written back even if it is the same object,
+    as augmented assignments like '+=' might have changed it in place.
+    A variable, that is undefined before the execution, is bound to a marker object instead. Every read of the local
+    name falls back to the container as long as it is bound to the marker, so that an undefined variable raises its
+    KeyError only where it is actually read, just like without the hoisting. All the local names are deleted again at
+    the end of the execution, so that they do not remain in the namespace of the shell. As the changed values are
+    written back only at the end, commands and background processes, that are called during the execution, will still
+    see the old values of the variables in the container.
+
+    EXAMPLE:
+    "for i in range(10): EnV['a'] += i * EnV['b']"
+    > "_EnV = object()
+       _EnV_a = EnV['a'] if 'a' in EnV.keys() else _EnV
+       _EnV_b = EnV['b'] if 'b' in EnV.keys() else _EnV
+       try:
+           for i in range(10):
+               if _EnV_a is _EnV: _EnV_a = EnV['a']
+               _EnV_a += i * (_EnV_b if _EnV_b is not _EnV else EnV['b'])
+       finally:
+           if _EnV_a is not _EnV: EnV['a'] = _EnV_a
+           del _EnV_a, _EnV_b, _EnV"
+
+    :param tree: (ast.Module) the syntax tree of the translated input
+    :return: (ast.Module) the syntax tree with the hoisted variables
+    """
+    analyzer = _EnvironmentalVariableAnalyzer()
+    analyzer.visit(tree)
+    variable_names = analyzer.get_hoistable_variables()
+    if len(variable_names) == 0:
+        return tree
+
+    tree = _EnvironmentalVariableHoister(variable_names).visit(tree)
+
+    prologue_list = ["{} = object()".format(HOISTED_UNDEFINED)]
+    epilogue_list = []
+    local_names = []
+    for variable_name in sorted(variable_names):
+        local_name = HOISTED_VARIABLE_FORMAT.format(variable_name)
+        local_names.append(local_name)
+        prologue_list.append("{0} = EnV[{1!r}] if {1!r} in EnV.keys() else {2}".format(local_name, variable_name,
+                                                                                       HOISTED_UNDEFINED))
+        if variable_name in analyzer.stored_variables:
+            epilogue_list.append("if {0} is not {1}: EnV[{2!r}] = {0}".format(local_name, HOISTED_UNDEFINED,
+                                                                             variable_name))
+    epilogue_list.append("del {}".format(", ".join(local_names + [HOISTED_UNDEFINED])))
+
+    try_statement = ast.parse("try:\n    pass\nfinally:\n    pass").body[0]
+    try_statement.body = tree.body
+    try_statement.finalbody = ast.parse("\n".join(epilogue_list)).body
+    tree.body = ast.parse("\n".join(prologue_list)).body + [try_statement]
+    return tree
+
+
+def _translate_syntax_tree(input_string, command_dict, inject_modules=False, hoist_variables=False):
+    """
+    Translates the string of the terminal input into a compiled code object, by only replacing the non python syntax
+    parts of the shell language as strings (see '_replace_shell_syntax'), parsing the result into a python syntax tree
+    and translating the command calls as nodes of that tree (see '_CommandCallTransformer'). The import statements of
+    the used command modules are added to the beginning of the tree, which is then compiled directly, without the
+    detour of generating and parsing the source code again.
+    Unlike the string based translation, this handles command calls at any nesting depth and within any python
+    expression, as the structure of the code is given by the python parser itself.
+
+    :param input_string: (string) the terminal input issued by the user
+    :param command_dict: (dict) the dictionary assigning the command names to their module names
+    :param inject_modules: (boolean) whether the import statements for the foreground commands are left out
+    :param hoist_variables: (boolean) whether the environmental variables are hoisted out of loops
+    :return: (code/tuple) the compiled code object, in case the modules are injected the tuple of the code object and
+    the frozenset of the names of the modules used by the foreground commands
+    """
+    tree = ast.parse(_replace_shell_syntax(input_string, command_dict), "<string>", "exec")
+    transformer = _CommandCallTransformer(command_dict, "fg_com")
+    tree = transformer.visit(tree)
+    if hoist_variables:
+        tree = _hoist_environmental_variables(tree)
+
+    if inject_modules:
+        ast.fix_missing_locations(tree)
+        return compile(tree, "<string>", "exec"), frozenset(transformer.modules)
+
+    import_list = [ast.Import(names=[ast.alias(name="JTSv2.commands.{}".format(module_name), asname=module_name)])
+                   for module_name in sorted(transformer.modules)]
+    tree.body = import_list + tree.body
+    ast.fix_missing_locations(tree)
+    return compile(tree, "<string>", "exec")
 
 
 def _translate_environmental_variables(input_string):
@@ -32,13 +632,12 @@ def _translate_environmental_variables(input_string):
     :param input_string:
     :return:
     """
-    translated_string = input_string
-    env_variable_list = _find_environmental_variables(input_string)
-    for variable_name in env_variable_list:
-        translated_string = stringops.replace_ignore_in_quotationmarks(translated_string, variable_name,
-                                                                       "EnV['{}']".format(variable_name.replace('$',
-                                                                                                                '')))
-    return translated_string
+    # all the variables are replaced within one single pass, the longest match being replaced makes sure, that the
+    # replacement of a variable can never affect the name of another variable, that starts with the same characters
+    replacement_dict = {}
+    for variable_name in _find_environmental_variables(input_string):
+        replacement_dict[variable_name] = "EnV['{}']".format(variable_name.replace('$', ''))
+    return stringops.replace_multiple_ignore_in_quotationmarks(input_string, replacement_dict)
 
 
 def _translate_commands(input_string, commandreferencedictionary):
@@ -72,6 +671,8 @@ def _translate_commands(input_string, commandreferencedictionary):
     """
     translated_string = input_string
     necessary_imports_list = []
+    # the replacements of the plain command calls, that are all done within one single pass at the end
+    replacement_dict = {}
 
     # There was an issue with translating multi line commands, whereas single line command worked perfectly, so the
     # command list is being created line wise, so that is only has to deal with single lines at a time
@@ -100,7 +701,6 @@ def _translate_commands(input_string, commandreferencedictionary):
         # run as a background process, therefore putting the main function call into background() function call, which
         # is a function within the execute module, that expects an executer object and the execution statement as string
         # so it can execute it as a Process.
-        translated_command = ""
         if command[0] == "!":
             translated_command = ''.join(["background(shell, ('''",
                                           "import JTSv2.commands.", command_name, " as ", command_name, "\n",
@@ -112,11 +712,21 @@ def _translate_commands(input_string, commandreferencedictionary):
             translated_command = ''.join(["help('''", module_name, "''')"])
 
         else:
-            translated_command = stringops.replace_ignore_in_quotationmarks(command, command_name + "("
-                                                                            , module_name+".main(fg_com,")
+            # for the plain command calls only the name and the opening bracket have to be replaced, which is the same
+            # for every call of the command, no matter the parameters
+            replacement_dict[command_name + "("] = module_name + ".main(fg_com,"
+            continue
 
         translated_string = stringops.replace_ignore_in_quotationmarks(translated_string, command, translated_command)
 
+    # The calls of all the other functions are added as replacements with themselves, so that the name of a function,
+    # that merely ends with the name of a command ('xcmd(' and 'cmd(') is never being replaced
+    if len(replacement_dict) != 0:
+        for name in _find_command_names(translated_string):
+            if len(name) != 0 and name + "(" not in replacement_dict:
+                replacement_dict[name + "("] = name + "("
+    translated_string = stringops.replace_multiple_ignore_in_quotationmarks(translated_string, replacement_dict)
+
     # getting rid of double imports, caused by the same command being called multiple times
     necessary_imports_list = list(set(necessary_imports_list))
     necessary_imports_list.sort()
@@ -141,10 +751,9 @@ def _find_command_names(input_str):
     :returns: (list)
     """
     command_list = []
-    reg = re.compile("""[^().,\-+"'#*'\s]*\(""")
-    for string in stringops.split_string_structures(input_str):
-        if not((string[0] == "'" or string[0] == '"') and (string[-1] == "'" or string[-1] == '"')):
-            command_list += re.findall(reg, string)
+    for start, end, is_quoted in stringops.get_string_spans(input_str):
+        if not is_quoted:
+            command_list += COMMAND_NAME_PATTERN.findall(input_str, start, end)
     return list(map(lambda x: x.replace(" ", "").replace("(", ""), command_list))
 
 
@@ -178,9 +787,8 @@ def _find_whole_commands(input_str):
     :return: (list) a list of string, that contain the whole function calls with the bracket body
     """
     command_list = []
-    string_list = stringops.split_string_structures(input_str)
 
-    # the algorithm will go through the string list, that was separated by the "split_string_structures" function of
+    # the algorithm will go through the spans of the string, that were found by the "get_string_spans" function of
     # the stringops module, that returns the string contents split by whether they are enclosed by quotes or not.
     # Inside the strings, that are not 'quoted', it'll first search commands with the
     # '_find_commands_without_string_parameters(string)' function and append those to the command list.
@@ -192,55 +800,55 @@ def _find_whole_commands(input_str):
 
     incomplete_command = []
     excess_opening_brackets = 0
-    for string in string_list:
-        if len(string) != 0:
-            if not((string[0] == "'" or string[0] == '"') and (string[-1] == "'" or string[-1] == '"')):
-                command_list += _find_commands_without_string_parameters(string)
-
-                carryover = excess_opening_brackets
-                if excess_opening_brackets > 0:
-                    bracket_balance = 0
-                    temporary_character_list = []
-                    for character in string:
-                        temporary_character_list.append(character)
-                        if character == "(":
-                            bracket_balance -= 1
-                        elif character == ")":
-                            bracket_balance += 1
-                            if bracket_balance == excess_opening_brackets:
-                                incomplete_command.append(''.join(temporary_character_list))
-                                command_list.append(''.join(incomplete_command))
-                                incomplete_command = []
-                                break
-
-                    incomplete_command.append(''.join(temporary_character_list))
-
-                excess_opening_brackets = string.count("(") - string.count(")") + carryover
-                if excess_opening_brackets > 0:
-                    temporary_character_list = []
-                    bracket_balance = 0
-                    index = -1
-                    while index >= -len(string):
-                        character = string[index]
-                        temporary_character_list.append(character)
-                        if character == ")":
-                            bracket_balance -= 1
-                        elif character == "(":
-                            bracket_balance += 1
+    for start, end, is_quoted in stringops.get_string_spans(input_str):
+        string = input_str[start:end]
+        if not is_quoted:
+            command_list += _find_commands_without_string_parameters(string)
+
+            carryover = excess_opening_brackets
+            if excess_opening_brackets > 0:
+                bracket_balance = 0
+                temporary_character_list = []
+                for character in string:
+                    temporary_character_list.append(character)
+                    if character == "(":
+                        bracket_balance -= 1
+                    elif character == ")":
+                        bracket_balance += 1
                         if bracket_balance == excess_opening_brackets:
-                            if character in ILLEGAL_CHARACTERS_FUNCTION_NOMENCLATURE:
-                                temporary_character_list.reverse()
-                                incomplete_command.append(''.join(temporary_character_list[1:]))
-                                break
-                            elif index == -len(string):
-                                temporary_character_list.reverse()
-                                incomplete_command.append(''.join(temporary_character_list))
-                                break
-                        index -= 1
+                            incomplete_command.append(''.join(temporary_character_list))
+                            command_list.append(''.join(incomplete_command))
+                            incomplete_command = []
+                            break
 
-            else:
-                if excess_opening_brackets > 0:
-                    incomplete_command.append(string)
+                incomplete_command.append(''.join(temporary_character_list))
+
+            excess_opening_brackets = string.count("(") - string.count(")") + carryover
+            if excess_opening_brackets > 0:
+                temporary_character_list = []
+                bracket_balance = 0
+                index = -1
+                while index >= -len(string):
+                    character = string[index]
+                    temporary_character_list.append(character)
+                    if character == ")":
+                        bracket_balance -= 1
+                    elif character == "(":
+                        bracket_balance += 1
+                    if bracket_balance == excess_opening_brackets:
+                        if character in ILLEGAL_CHARACTERS_FUNCTION_NOMENCLATURE:
+                            temporary_character_list.reverse()
+                            incomplete_command.append(''.join(temporary_character_list[1:]))
+                            break
+                        elif index == -len(string):
+                            temporary_character_list.reverse()
+                            incomplete_command.append(''.join(temporary_character_list))
+                            break
+                    index -= 1
+
+        else:
+            if excess_opening_brackets > 0:
+                incomplete_command.append(string)
 
     # recursively the function will call itself, as long is it notices, that within one of its commands is another
     # command call, as it is indeed possible to use a command call as the parameter of another command as 'deep' as
@@ -326,52 +934,718 @@ def _find_environmental_variables(input_string):
     :return:
     """
     variable_list = []
-    string_list = stringops.split_string_structures(input_string)
-    reg = re.compile("""\$[^'".,()\-+\s=;:]+""")
-    for string in string_list:
-        if len(string) > 0 and not((string[0] == "'" or string[0] == '"') and (string[-1] == "'" or string[-1] == '"')):
-            variable_list += re.findall(reg, string)
+    for start, end, is_quoted in stringops.get_string_spans(input_string):
+        if not is_quoted:
+            variable_list += ENVIRONMENTAL_VARIABLE_PATTERN.findall(input_string, start, end)
     return variable_list
 
 
-# TODO: make the command folder a parameter
+class TranslationCache:
+    """
+    The memoization layer in front of the 'translate' function, as the same command lines are being issued over and
+    over again. The translations are stored in a size bounded LRU cache with the raw input string and the translation
+    mode as key. As the translation depends on the registered commands, the cache is cleared as soon as the generation
+    counter of the command reference dictionary changes.
+    Optionally the translations are also persisted in a DiskCache, so that they survive a restart of the server. The
+    python source code translations are persisted together with their compiled code objects, which are put into the
+    code cache of the execution, so that neither the translation nor the compilation is necessary after a restart. The
+    key of the persisted entries is the hash of the input and the options, the fingerprint of the commands, the hash of
+    the translator and the magic number of the python version.
+
+    :ivar command_reference_dictionary: (CommandReferenceDictionary) the reference of the command names to modules
+
+    :ivar cache: (LRUCache) the cache of the translations, also counting the hits, misses and evictions
+
+    :ivar disk_cache: (DiskCache) the persistent cache of the translations or None
+    """
+    def __init__(self, command_reference_dictionary, max_size=256, disk_cache=None):
+        self.command_reference_dictionary = command_reference_dictionary
+        self.cache = cacheutil.LRUCache(max_size)
+        self.disk_cache = disk_cache
+
+        self._generation = command_reference_dictionary.generation
+        self._lock = threading.Lock()
+
+    def translate(self, input_str, mode=MODE_SOURCE, inject_modules=False, hoist_variables=False, memory=True):
+        """
+        Translates the input string, just like the 'translate' function, but only in case the same input has not been
+        translated since the last change of the registered commands
+        :param input_str: (string) the terminal input issued by the user
+        :param mode: (string) MODE_SOURCE on default, MODE_CODE for the compiled code object
+        :param inject_modules: (boolean) whether the command modules are injected into the execution namespace
+        :param hoist_variables: (boolean) whether the environmental variables are hoisted out of loops
+        :param memory: (boolean) whether the in memory cache is used. True on default, large inputs like whole scripts
+        only use the persistent cache
+        :return: (string/code/tuple) the translated python code, in case the modules are injected together with the
+        names of the modules
+        """
+        # the whole translation is done with one snapshot of the commands, so it can not be affected by a change of the
+        # commands during the translation. Only a newer generation clears the cache, a thread, that took its snapshot
+        # just before a change, must not clear the translations of the newer one
+        snapshot = self.command_reference_dictionary.snapshot
+        generation = snapshot.generation
+        with self._lock:
+            if generation > self._generation:
+                self.cache.clear()
+                self._generation = generation
+
+        # The generation is part of the key, so that a translation, that was done during a change of the commands
+        # can never be mistaken as a current one
+        key = (generation, mode, inject_modules, hoist_variables, input_str)
+        translation = self.cache.get(key) if memory else None
+        if translation is None:
+            translation = self._translate_persistent(input_str, snapshot, mode, inject_modules, hoist_variables,
+                                                     memory)
+            if memory:
+                self.cache.put(key, translation)
+        return translation
+
+    def _translate_persistent(self, input_str, snapshot, mode, inject_modules, hoist_variables, memory=True):
+        """
+        Translates the input string, taking the translation from the persistent cache, in case it is enabled and
+        contains the translation. The compiled code of the python source code translations is put into the code cache
+        of the execution, except for the large inputs, which do not use the in memory caches, those are returned as
+        the compiled code object directly
+        :param input_str: (string) the terminal input issued by the user
+        :param snapshot: (CommandSnapshot) the state of the commands, the translation is done with
+        :param mode: (string) the mode of the translation
+        :param inject_modules: (boolean) whether the command modules are injected into the execution namespace
+        :param hoist_variables: (boolean) whether the environmental variables are hoisted out of loops
+        :param memory: (boolean) whether the in memory caches are used. True on default
+        :return: (string/code/tuple) the translated python code, in case the modules are injected together with the
+        names of the modules
+        """
+        if self.disk_cache is None:
+            return translate(input_str, snapshot, mode, inject_modules, hoist_variables)
+
+        disk_key = self.disk_cache.make_key(importlib.util.MAGIC_NUMBER, TRANSLATOR_HASH, snapshot.fingerprint, mode,
+                                            inject_modules, hoist_variables, input_str)
+        entry = self.disk_cache.get(disk_key)
+        if entry is not None:
+            translation, code = entry
+        else:
+            translation = translate(input_str, snapshot, mode, inject_modules, hoist_variables)
+            source = translation[0] if inject_modules else translation
+            code = None
+            if isinstance(source, str):
+                # a syntax error is reported by the execution, just like without the persistent cache
+                try:
+                    code = compile(source, '<string>', 'exec')
+                except SyntaxError:
+                    pass
+            self.disk_cache.put(disk_key, (translation, code))
+
+        if code is None:
+            return translation
+        if memory:
+            execute.CODE_CACHE.put(translation[0] if inject_modules else translation, code)
+            return translation
+        return (code, translation[1]) if inject_modules else code
+
+    def statistics(self):
+        """
+        The size and the hit, miss and eviction counters of the cache
+        :return: (dict)
+        """
+        statistics = self.cache.statistics()
+        if self.disk_cache is not None:
+            statistics["disk"] = self.disk_cache.statistics()
+        return statistics
+
+
+class CommandManifest:
+    """
+    The manifest of the command directory, which is the compact, persisted index of all the command modules within the
+    directory. Every module, that defines a 'main' function, is automatically discovered as a command with the name of
+    the module. The entries of the modules contain the path, the modification time and the size of the module file, so
+    that a module is only read again, after it has been changed, and the doc string of the main function, so that the
+    modules never have to be imported for the help. A scan only searches the source of the changed modules for the
+    definition of the main function, the doc string is parsed with the 'ast' module only once it is requested for the
+    first time (see 'get_doc').
+    Additionally the manifest contains the aliases, which are the command names, that are assigned to modules of a
+    different name. Those are taken over from the "command reference.ini" file of the directory, whenever that file has
+    been changed, and are added by registering commands at runtime. The aliases are built again from those two sources
+    with every scan, so that the aliases removed from the file are removed from the manifest as well.
+    The whole manifest is a single versioned JSON file, that is loaded with one read. Multiple changes can be batched
+    (see 'batch'), so that the file is only written once, always replacing the old file only after the new one has been
+    completely written.
+
+    :ivar command_directory: (string) the path of the directory containing the command modules
+
+    :ivar file_path: (string) the path of the file, the manifest is persisted in
+
+    :ivar reference_path: (string) the path of the "command reference.ini" file with the aliases
+
+    :ivar modules: (dict) the module names as keys to dicts with the 'path', 'mtime', 'size', 'main' and 'doc' of the
+    modules, 'main' being whether the module defines a main function. The 'doc' is only added, once it has been
+    requested
+
+    :ivar aliases: (dict) the command names as keys to the names of the modules, they are assigned to
+
+    :ivar reference_aliases: (dict) the aliases of the "command reference.ini" file
+
+    :ivar added_aliases: (dict) the aliases added at runtime, which take precedence over those of the file
+
+    :ivar reference_mtime: (int) the modification time of the "command reference.ini" file, when its aliases were read
+    """
+    VERSION = 2
+
+    def __init__(self, command_directory):
+        self.command_directory = command_directory
+        self.file_path = os.path.join(self.command_directory, "command manifest.json")
+        self.reference_path = os.path.join(self.command_directory, "command reference.ini")
+
+        self.modules = {}
+        self.aliases = {}
+        self.reference_aliases = {}
+        self.added_aliases = {}
+        self.reference_mtime = None
+
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._changed = False
+        self.load()
+
+    def load(self):
+        """
+        Loads the persisted manifest from its file, an unreadable file or a file of another version results in a empty
+        manifest, which will be filled by the next scan
+        :return: (void)
+        """
+        try:
+            with open(self.file_path, "r") as file:
+                content = json.load(file)
+        except (OSError, ValueError):
+            content = {}
+        if content.get("version") != self.VERSION:
+            content = {}
+
+        with self._lock:
+            self.modules = content.get("modules", {})
+            self.reference_aliases = content.get("reference_aliases", {})
+            self.added_aliases = content.get("added_aliases", {})
+            self.aliases = self._build_aliases()
+            self.reference_mtime = content.get("reference_mtime")
+
+    def save(self):
+        """
+        Writes the manifest into its file, replacing the old file only after the new one has been completely written.
+        Within a batch the manifest is only marked as changed and written at the end of the batch
+        :return: (void)
+        """
+        with self._lock:
+            if self._batch_depth > 0:
+                self._changed = True
+                return
+            content = {"version": self.VERSION,
+                       "modules": self.modules,
+                       "reference_aliases": self.reference_aliases,
+                       "added_aliases": self.added_aliases,
+                       "reference_mtime": self.reference_mtime}
+            temporary_path = self.file_path + ".tmp"
+            try:
+                with open(temporary_path, "w") as file:
+                    json.dump(content, file)
+                os.replace(temporary_path, self.file_path)
+            except OSError:
+                # a command directory, that is not writable, is simply scanned again with the next start
+                return
+            self._changed = False
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        The context manager, that defers all the saves within its block, so that the manifest is written only once at
+        the end of the block, in case it has been changed. Batches can be nested.
+        :return: (void)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._changed:
+                    self.save()
+
+    def scan(self):
+        """
+        Updates the manifest with the current state of the command directory: New and changed modules are parsed,
+        the entries of removed modules are deleted and the aliases are read again, in case the "command reference.ini"
+        file has been changed or removed. Listing the directory is the only cost for the modules, that have not
+        changed. The manifest is saved in case anything has changed
+        :return: (boolean) whether the manifest has been changed
+        """
+        changed = False
+        module_names = set()
+        with self._lock:
+            try:
+                directory_entry_list = list(os.scandir(self.command_directory))
+            except OSError:
+                directory_entry_list = []
+            for directory_entry in directory_entry_list:
+                module_name, extension = os.path.splitext(directory_entry.name)
+                if extension != ".py" or module_name == "__init__" or not directory_entry.is_file():
+                    continue
+                module_names.add(module_name)
+                if self._update_module(module_name, directory_entry.path, directory_entry.stat()):
+                    changed = True
+
+            for module_name in set(self.modules.keys()) - module_names:
+                del self.modules[module_name]
+                changed = True
+
+            try:
+                reference_mtime = os.stat(self.reference_path).st_mtime_ns
+            except OSError:
+                reference_mtime = None
+            if reference_mtime != self.reference_mtime:
+                reference_parser = configparser.ConfigParser()
+                reference_parser.read(self.reference_path)
+                self.reference_aliases = {}
+                if reference_parser.has_section("Commands"):
+                    self.reference_aliases = dict(reference_parser["Commands"])
+                self.reference_mtime = reference_mtime
+                changed = True
+            self.aliases = self._build_aliases()
+
+            if changed:
+                self.save()
+        return changed
+
+    def get_commands(self):
+        """
+        The dictionary of all the commands, the discovered modules with main functions under their own names and the
+        aliases, which take precedence
+        :return: (dict) the command names as keys to the module names
+        """
+        with self._lock:
+            command_dict = {module_name: module_name for module_name, entry in self.modules.items() if entry["main"]}
+            command_dict.update(self.aliases)
+        return command_dict
+
+    def add_alias(self, command_name, module_name):
+        """
+        Adds the alias of a command name to a module name and saves the manifest (once at the end, within a batch)
+        :param command_name: (string) the name of the command
+        :param module_name: (string) the name of the module within the command directory
+        :return: (void)
+        """
+        with self._lock:
+            self.added_aliases[command_name] = module_name
+            self.aliases[command_name] = module_name
+            self.save()
+
+    def _build_aliases(self):
+        """
+        :return: (dict) the aliases of the "command reference.ini" file updated with the aliases added at runtime
+        """
+        aliases = dict(self.reference_aliases)
+        aliases.update(self.added_aliases)
+        return aliases
+
+    def get_doc(self, module_name, save=True):
+        """
+        Gets the doc string of the main function of the command module with the given name, parsing the module file
+        only in case the doc string has not been requested for the current state of the file yet
+        :param module_name: (string) the name of the module within the command directory
+        :param save: (boolean) whether the manifest is saved in case the entry had to be updated. True on default
+        :return: (string) the doc string or None in case the module or its main function have no doc string
+        """
+        module_path = os.path.join(self.command_directory, "{}.py".format(module_name))
+        try:
+            stat = os.stat(module_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            changed = self._update_module(module_name, module_path, stat)
+            entry = self.modules[module_name]
+            if "doc" not in entry:
+                entry["doc"] = self.parse_doc(module_path) if entry["main"] else None
+                changed = True
+            if changed and save:
+                self.save()
+            return entry["doc"]
+
+    def _update_module(self, module_name, module_path, stat):
+        """
+        Reads the module file again, in case its entry does not match the given state of the file. The new entry only
+        contains whether the module defines a main function, its doc string is read by 'get_doc'
+        :param module_name: (string) the name of the module
+        :param module_path: (string) the path of the module file
+        :param stat: (os.stat_result) the current state of the module file
+        :return: (boolean) whether the entry has been updated
+        """
+        entry = self.modules.get(module_name)
+        if entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return False
+
+        self.modules[module_name] = {"path": module_path, "mtime": stat.st_mtime_ns, "size": stat.st_size,
+                                     "main": self.has_main(module_path)}
+        return True
+
+    @staticmethod
+    def has_main(module_path):
+        """
+        Searches the source code of the module for the definition of a 'main' function on its top level, without
+        parsing or importing the module
+        :param module_path: (string) the path of the module file
+        :return: (boolean) whether the module defines a main function
+        """
+        try:
+            with open(module_path, "r", encoding="utf-8", errors="replace") as file:
+                return MAIN_FUNCTION_PATTERN.search(file.read()) is not None
+        except OSError:
+            return False
+
+    @staticmethod
+    def parse_doc(module_path):
+        """
+        Reads the doc string of the 'main' function from the source code of the module, without importing it
+        :param module_path: (string) the path of the module file
+        :return: (string) the cleaned doc string, just like 'inspect.getdoc' would return it, or None in case there is
+        no doc string or the module has an invalid syntax
+        """
+        try:
+            with open(module_path, "rb") as file:
+                tree = ast.parse(file.read(), module_path)
+        except (OSError, SyntaxError, ValueError):
+            return None
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "main":
+                return ast.get_docstring(node)
+        return None
+
+
+class CommandSnapshot(collections.namedtuple("CommandSnapshot", ["generation", "dict", "module_names", "fingerprint"])):
+    """
+    The immutable state of the registered commands at one point in time. As it offers the same 'dict' attribute as the
+    CommandReferenceDictionary, a snapshot can be passed to the 'translate' function in its place, so that a whole
+    translation is done with one consistent state of the commands.
+
+    :ivar generation: (int) the generation of the commands, increased with every change
+
+    :ivar dict: (MappingProxyType) the read only dictionary of the command names to their module names
+
+    :ivar module_names: (frozenset) the names of all the modules of the commands
+
+    :ivar fingerprint: (string) the hash of the commands, which unlike the generation is the same for the same commands
+    after a restart of the server
+    """
+    __slots__ = ()
+
+    @classmethod
+    def create(cls, generation, command_dict):
+        """
+        Creates the snapshot of the given dictionary, which must not be changed afterwards
+        :param generation: (int) the generation of the snapshot
+        :param command_dict: (dict) the command names as keys to the module names
+        :return: (CommandSnapshot)
+        """
+        fingerprint = hashlib.sha256(json.dumps(sorted(command_dict.items())).encode()).hexdigest()
+        return cls(generation, types.MappingProxyType(command_dict), frozenset(command_dict.values()), fingerprint)
+
+
+def get_command_directories(config_parser, project_directory):
+    """
+    Reads the command directories from the config: the 'commands_dir' followed by the additional directories of the
+    'command_search_path', one path per line. Relative paths are relative to the project directory
+    Args:
+        config_parser: The ConfigParser of the config, whose 'Paths' section contains the directories
+        project_directory: The string path of the project directory
+
+    Returns:
+    The list of the paths of the command directories in the order of their precedence
+    """
+    command_directories = [config_parser.get("Paths", "commands_dir",
+                                             fallback=os.path.join(project_directory, "commands"))]
+    command_directories += [path.strip() for path in
+                            config_parser.get("Paths", "command_search_path", fallback="").splitlines()
+                            if len(path.strip()) != 0]
+    return [os.path.join(project_directory, command_directory) for command_directory in command_directories]
+
+
 class CommandReferenceDictionary:
+    """
+    The registry of the commands, assigning the command names to the names of their modules within the command
+    directories. The command directories are searched in order, the first directory being the one of the commands
+    package, all the other directories are appended to the search path of the package, so that all command modules are
+    imported as 'JTSv2.commands.<name>' and only on their first call. The commands of all directories are merged into
+    one index without importing any module (see CommandManifest), a command or module of an earlier directory takes
+    precedence over one with the same name in a later directory.
+    The registry is copy on write: every change creates a new immutable CommandSnapshot under a lock and
+    replaces the old one with a single assignment, so that all the shells can read the commands without locking and
+    never see a half updated state. A reader, that needs multiple consistent lookups, should take the 'snapshot' once
+    and use it for all of them.
+    The commands changed at runtime (set, deleted or cleared) are kept as a separate layer on top of the scanned
+    commands, so that a new scan of the command directories does not undo those changes.
 
-    def __init__(self):
-        self.dict = {}
+    :ivar snapshot: (CommandSnapshot) the current state of the registered commands
+
+    :ivar command_directories: (list) the paths of the command directories in the order of their precedence
+
+    :ivar command_directory: (string) the path of the first command directory, the one of the commands package
 
-        # dynamically calculating the the file path of the "command reference.ini" file, that contains the pickled data
-        # of the dictionary used to translate the command names into module names
-        config_parser = configparser.ConfigParser()
-        config_parser.read("config.ini")
-        self.command_directory = config_parser["Paths"]["commands_dir"]
-        self.file_path = ''.join([self.command_directory, "/command reference.ini"])
-        # loading the config file, containing the reference assignments
-        self.reference_parser = configparser.ConfigParser()
-        self.reference_parser.read(self.file_path)
+    :ivar manifests: (list) the manifests of the command directories, also containing the doc strings
 
-        self.dict = dict(self.reference_parser["Commands"])
+    :ivar manifest: (CommandManifest) the manifest of the first directory, which keeps the commands registered at
+    runtime
 
-        self.doc_string_dict = {}
-        self.load_doc()
+    :ivar module_dict: (dict) the already imported command modules by their module names
+
+    :ivar reload_count: (int) the amount of times command modules have been reloaded, so that processes, which import
+    the command modules themselves, can detect, that they have to import them again
+    """
+    def __init__(self, command_directories=None):
+        """
+        :param command_directories: (list) the paths of the command directories (see get_command_directories). None on
+        default, in which case only the directory of the commands package is used. A warning is issued for every
+        directory, that does not exist, as it would not contribute any commands
+        """
+        if command_directories is None:
+            command_directories = [os.path.dirname(os.path.abspath(command_package.__file__))]
+        for command_directory in command_directories:
+            if not os.path.isdir(command_directory):
+                warnings.warn("The command directory '{}' does not exist".format(command_directory))
+        self.command_directories = command_directories
+        self.command_directory = command_directories[0]
+        command_package.extend_path(self.command_directories)
+
+        # The manifests of the command directories discover the command modules and keep the aliases of the
+        # "command reference.ini" files, only the modules, that have changed since the last start are being parsed.
+        # The doc strings are part of the manifests as well, so the modules do not have to be imported for the help
+        self.manifests = [CommandManifest(command_directory) for command_directory in self.command_directories]
+        self.manifest = self.manifests[0]
+
+        # The commands of the last scan and the runtime changes on top of them, the command names as keys to the
+        # module names or None for the deleted commands. After clearing the registry the scanned commands are ignored
+        self._scanned_dict = self._scan()
+        self._override_dict = {}
+        self._cleared = False
+
+        # The generation is increased with every change of the registered commands, so that cached translations can
+        # detect, that they are outdated
+        self.snapshot = CommandSnapshot.create(0, dict(self._scanned_dict))
+        # Only one change of the commands can happen at a time, readers do not need the lock
+        self._write_lock = threading.Lock()
+
+        # The imported command modules by their module names
+        self.module_dict = {}
+        # Only one reload of the command modules can happen at a time
+        self._reload_lock = threading.Lock()
+        self.reload_count = 0
 
     # TODO: maybe raise an exception in case there is no command with such a name
     def add(self, command_name, module_name):
-        self.dict[command_name] = module_name
-        # saving the fresh command, just to be sure
-        self.save()
+        self._update({command_name: module_name})
+        # saving the fresh command as alias in the manifest, within a batch it is only saved once at the end
+        self.manifest.add_alias(command_name, module_name)
+
+    def update(self, command_dict):
+        """
+        Registers all the commands of the given dictionary at once, creating only one new snapshot and writing the
+        manifest only once
+        Args:
+            command_dict: The dict of the command names as keys to the module names
+
+        Returns:
+        void
+        """
+        self._update(command_dict)
+        with self.manifest.batch():
+            for command_name, module_name in command_dict.items():
+                self.manifest.add_alias(command_name, module_name)
+
+    def batch(self):
+        """
+        The context manager for registering multiple commands at once, the manifest is only written once at the end
+        of the block
+        Returns:
+        The context manager
+        """
+        return self.manifest.batch()
+
+    def discover(self):
+        """
+        Scans the command directory again, so that new, changed and removed command modules are taken over into the
+        registered commands. The commands changed at runtime keep their changes
+        Returns:
+        Whether the registered commands have changed
+        """
+        scanned_dict = self._scan()
+        with self._write_lock:
+            self._scanned_dict = scanned_dict
+            command_dict = self._merge()
+            if command_dict == self.snapshot.dict:
+                return False
+            self.snapshot = CommandSnapshot.create(self.snapshot.generation + 1, command_dict)
+        return True
+
+    def _scan(self):
+        """
+        Scans all the command directories and merges their commands
+        Returns:
+        The dict of all the command names as keys to their module names
+        """
+        command_dict = {}
+        # the later directories are merged first, so that the earlier ones overwrite their commands
+        for manifest in reversed(self.manifests):
+            manifest.scan()
+            command_dict.update(manifest.get_commands())
+        return command_dict
+
+    def _get_manifest(self, module_name):
+        """
+        Gets the manifest of the first command directory, that contains the module with the given name, which is the
+        module, that will be imported
+        Args:
+            module_name: The name of the command module
+
+        Returns:
+        The CommandManifest or None, in case no directory contains the module
+        """
+        for manifest in self.manifests:
+            if os.path.isfile(os.path.join(manifest.command_directory, "{}.py".format(module_name))):
+                return manifest
+        return None
+
+    @property
+    def dict(self):
+        """
+        The read only dictionary of the command names to the module names of the current snapshot
+        """
+        return self.snapshot.dict
+
+    @property
+    def generation(self):
+        """
+        The generation of the current snapshot
+        """
+        return self.snapshot.generation
+
+    def _update(self, override_dict, clear=False):
+        """
+        Changes the registered commands by adding the changes to the runtime layer and replacing the snapshot with a
+        new one of the scanned commands merged with that layer
+        Args:
+            override_dict: The dict of the command names as keys to the module names or None for deleting the command
+            clear: Whether all the commands are removed before the changes are applied. False on default
+
+        Returns:
+        void
+        """
+        with self._write_lock:
+            if clear:
+                self._override_dict.clear()
+                self._cleared = True
+            self._override_dict.update(override_dict)
+            self.snapshot = CommandSnapshot.create(self.snapshot.generation + 1, self._merge())
+
+    def _merge(self):
+        """
+        Merges the runtime changes on top of the scanned commands, must be called holding the write lock
+        Returns:
+        The new dict of the command names as keys to the module names
+        """
+        command_dict = {} if self._cleared else dict(self._scanned_dict)
+        for command_name, module_name in self._override_dict.items():
+            if module_name is None:
+                command_dict.pop(command_name, None)
+            else:
+                command_dict[command_name] = module_name
+        return command_dict
 
     def get_modulename(self, command_name):
         return self[command_name]
 
+    def get_module(self, module_name):
+        """
+        Gets the module object of the command module with the given name, importing it only on the first request
+        Args:
+            module_name: The string name of the module within the commands folder
+
+        Returns:
+        The module object
+        """
+        module = self.module_dict.get(module_name)
+        if module is None:
+            module = importlib.import_module("JTSv2.commands.{}".format(module_name))
+            self.module_dict[module_name] = module
+        return module
+
+    def resolve_modules(self, names):
+        """
+        Creates the dictionary of the module objects for all those of the given names, that are the names of registered
+        command modules, so that the modules can be injected into the namespace of the execution directly, instead of
+        importing them with import statements
+        Args:
+            names: The iterable of module names, as returned by the translation together with the translated code
+
+        Returns:
+        The dict with the module names as keys and the module objects as values
+        """
+        module_names = self.snapshot.module_names
+        return {name: self.get_module(name) for name in names if name in module_names}
+
+    def reload_modules(self, module_names):
+        """
+        Loads fresh module objects for those of the given command modules, that have already been imported, and swaps
+        them into 'sys.modules' and the internal module dict, afterwards the command directory is scanned again, so that
+        the registered commands and their doc strings are updated as well. The old module objects are not modified,
+        so executions, that are running at the moment, keep using the old version of the command, whereas all the
+        executions starting afterwards import the new one. A module, that can not be loaded, keeps its old version.
+        Args:
+            module_names: The iterable of the names of the changed modules within the commands folder
+
+        Returns:
+        The dict with the names of the modules, that could not be loaded, as keys to the exceptions raised
+        """
+        error_dict = {}
+        package = sys.modules["JTSv2.commands"]
+        importlib.invalidate_caches()
+        with self._reload_lock:
+            for module_name in module_names:
+                full_name = "JTSv2.commands.{}".format(module_name)
+                # a module, that has never been imported, will be loaded in its current version anyway
+                if full_name not in sys.modules and module_name not in self.module_dict:
+                    continue
+
+                # The path finder is used, as 'importlib.util.find_spec' would return the spec of the old module
+                spec = importlib.machinery.PathFinder.find_spec(full_name, package.__path__)
+                if spec is None:
+                    # the module has been removed
+                    sys.modules.pop(full_name, None)
+                    self.module_dict.pop(module_name, None)
+                    if hasattr(package, module_name):
+                        delattr(package, module_name)
+                    continue
+
+                try:
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+                except Exception as exception:
+                    error_dict[module_name] = exception
+                    continue
+                # the import statement 'import JTSv2.commands.name as name' gets the module as attribute of the package
+                sys.modules[full_name] = module
+                setattr(package, module_name, module)
+                self.module_dict[module_name] = module
+
+            self.reload_count += 1
+            self.discover()
+        return error_dict
+
     def is_command(self, command_name):
-        return command_name in self.dict.keys()
+        return command_name in self.dict
 
     def save(self):
-        self.reference_parser.write(open(self.file_path, "w"))
+        for manifest in self.manifests:
+            manifest.save()
 
     def clear(self):
-        self.dict = {}
+        self._update({}, clear=True)
 
     def get_doc(self, command_name):
         """
@@ -382,28 +1656,28 @@ class CommandReferenceDictionary:
         Returns:
         The full doc string for the commands underlying function
         """
-        return self.doc_string_dict[command_name]
+        manifest = self._get_manifest(self[command_name])
+        if manifest is None:
+            return None
+        return manifest.get_doc(self[command_name])
 
     def load_doc(self):
         """
-        This function dynamically and temporarily imports the modules for every command registered in the internal
-        command reference dict, extracts the doc string of main method and puts it into the internal doc string dict
-        with the command name being the key.
-        This method loads the doc strings of the commands into internal storage.
+        This method makes sure the doc strings of all the commands registered in the internal command reference dict
+        are in the manifest, saving the manifest only once afterwards. This is not necessary for the 'get_doc'
+        method to work, as the manifest is updated lazily, but the modules will not have to be parsed later on.
         Notes:
-            - Due to the dynamic imports os so many modules, this function actually takes up a lot of time.
+            - The modules are not being imported, their doc strings are read from their source files
         Returns:
         void
         """
-        # Loading the doc string for every command, currently in the internal reference dict
-        for command_name in self.dict.keys():
-            module_name = self[command_name]
-            # Dynamically importing the module, which contains the function for the current command name
-            import_string = "JTSv2.commands.{}".format(module_name)
-            module = importlib.import_module(import_string)
-            # Getting the doc string of the modules main function and assigning it to the command name in the dict
-            doc_string = inspect.getdoc(module.main)
-            self.doc_string_dict[command_name] = doc_string
+        with contextlib.ExitStack() as stack:
+            for manifest in self.manifests:
+                stack.enter_context(manifest.batch())
+            for module_name in set(self.dict.values()):
+                manifest = self._get_manifest(module_name)
+                if manifest is not None:
+                    manifest.get_doc(module_name)
 
     def keys(self):
         """
@@ -420,10 +1694,12 @@ class CommandReferenceDictionary:
         return self.dict[key]
 
     def __delitem__(self, key):
-        del self.dict[key]
+        if key not in self.dict:
+            raise KeyError(key)
+        self._update({key: None})
 
     def __setitem__(self, key, value):
-        self.dict[key] = value
+        self._update({key: value})
 
     def __iter__(self):
         return iter(self.dict.values())
\ No newline at end of file
@@ -0,0 +1,491 @@
+__author__ = 'Jonas'
+import JTSv2.datamanage as datamanage
+import JTSv2.lib.cacheutil as cacheutil
+import JTSv2.lib.timingutil as timingutil
+import JTSv2.commands as commands
+import collections.abc
+import multiprocessing
+import importlib
+import threading
+import builtins
+import marshal
+import signal
+import types
+import time
+import sys
+import os
+
+# The requests and responses of the channel between a shell and its worker process, every one of them being a tuple
+# starting with one of these strings:
+# shell -> worker: (EXECUTE, command id, packed code, injected module names, command version)
+# The command version is the tuple of the generation of the registered commands and the reload count of the modules
+# worker -> shell: (MESSAGE, message), (PROMPT, prompt, timeout, data type), (CALL, target, method name, args, kwargs),
+#                  (BACKGROUND, execution statement), (TRANSLATE, script string), (FINISHED, timings)
+# The value returned for TRANSLATE is the tuple of the packed code and the injected module names
+# shell -> worker as the response to PROMPT, CALL, BACKGROUND and TRANSLATE: (RETURN, value), (RAISE, exception)
+EXECUTE = "execute"
+MESSAGE = "message"
+PROMPT = "prompt"
+CALL = "call"
+BACKGROUND = "background"
+TRANSLATE = "translate"
+FINISHED = "finished"
+RETURN = "return"
+RAISE = "raise"
+
+# The names of the objects of the shell, whose methods can be called by the worker process
+TARGET_ENV = "env"
+TARGET_COM = "com"
+TARGET_PROCESS_LIST = "process_list"
+TARGET_COMMAND_REFERENCE = "cmd_ref"
+TARGET_LATENCY_RECORDER = "latency_recorder"
+
+
+class ForegroundWorker:
+    """
+    The pre-started process, that executes the foreground commands of a shell, so that the commands of multiple shells
+    do not share the interpreter lock of the server process. The process is started as soon as the shell is created and
+    keeps its own namespace and imported command modules from one command to the next.
+    The shell side of the channel is served by the foreground worker thread of the shell itself, while it waits for the
+    command to finish: the messages of the command are delivered by the shell and the environmental variables, input
+    prompts, background commands and scripts are handled within the server process, where the variables live,
+    answering the worker right away.
+
+    :ivar shell: (Shell) The shell, whose commands are executed by the worker
+
+    :ivar process: (multiprocessing.Process) The worker process
+
+    :ivar connection: (multiprocessing.connection.Connection) The shell side of the channel to the process
+
+    :ivar interrupt_timeout: (float) The time in seconds, a cancelled command has to end, before the worker process is
+    replaced by a new one
+    """
+    def __init__(self, shell, interrupt_timeout=1.0):
+        self.shell = shell
+        self.interrupt_timeout = interrupt_timeout
+        self.process = None
+        self.connection = None
+        self.start()
+
+    def start(self):
+        """
+        Starts the worker process, the command modules are found within the same search path as within the server
+        :return: (void)
+        """
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_run_worker,
+                                               args=(worker_connection, list(commands.__path__),
+                                                     self.shell.shell_server.project_directory,
+                                                     self.shell.persistent_namespace),
+                                               daemon=True)
+        self.process.start()
+        worker_connection.close()
+
+    def stop(self):
+        """
+        Terminates the worker process
+        :return: (void)
+        """
+        self.connection.close()
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def restart(self):
+        """
+        Replaces the worker process with a new one, which loses the namespace of the previous commands
+        :return: (void)
+        """
+        self.stop()
+        self.start()
+
+    def execute(self, command, translated_string):
+        """
+        Executes the translated input of the command within the worker process, serving the requests of the process,
+        until the command has finished. In case the command is cancelled while waiting, the worker process is
+        interrupted as well
+        :param command: (_Command) the command of the shell, whose input is executed
+        :param translated_string: (string/code/tuple) the translated input, together with the names of the modules to
+        be injected, in case the shell injects the modules
+        :return: (void)
+        """
+        if not self.process.is_alive():
+            self.start()
+
+        packed_code, module_names = self._pack_translation(translated_string)
+        command_reference_dictionary = self.shell.shell_server.command_reference_dictionary
+        self.connection.send((EXECUTE, command.command_id, packed_code, module_names,
+                              (command_reference_dictionary.generation, command_reference_dictionary.reload_count)))
+        try:
+            while True:
+                request = self._receive()
+                if request[0] == FINISHED:
+                    command.timings.update(request[1])
+                    return
+                self._serve(command, request)
+        except datamanage.CommandCancelled:
+            self._interrupt()
+            raise
+
+    def _receive(self, timeout=None):
+        """
+        Waits for the next request of the worker process. The waiting is done in short steps, so that the cancellation
+        of the command, which is raised as asynchronous exception, is not delayed by the blocking wait
+        :param timeout: (float) the maximum time in seconds to wait. None on default, in which case there is no limit
+        :return: (tuple) the request or None in case of the timeout
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.connection.poll(0.05):
+            if not self.process.is_alive():
+                raise RuntimeError("The worker process of the shell has ended unexpectedly")
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+        return self.connection.recv()
+
+    def _serve(self, command, request):
+        """
+        Handles a single request of the worker process
+        :param command: (_Command) the command being executed
+        :param request: (tuple) the request
+        :return: (void)
+        """
+        kind = request[0]
+        if kind == MESSAGE:
+            self.shell.put_message(request[1])
+            return
+
+        try:
+            if kind == PROMPT:
+                value = self.shell.prompt_input(*request[1:])
+            elif kind == CALL:
+                _, target, method_name, args, kwargs = request
+                value = _get_transferable(getattr(self._get_target(target), method_name)(*args, **kwargs))
+            elif kind == BACKGROUND:
+                import JTSv2.execute as execute
+                value = execute.background(self.shell, request[1])
+            elif kind == TRANSLATE:
+                value = self._pack_translation(self.shell.translate_input(request[1], use_cache=False))
+            else:
+                raise ValueError("Unknown request of the worker process: {}".format(kind))
+        except Exception as e:
+            self._send_exception(e)
+            return
+        self.connection.send((RETURN, value))
+
+    def _pack_translation(self, translated_string):
+        """
+        Prepares the translation of the shell for the transfer to the worker process. The injected modules are imported
+        by the worker itself, only their names are sent
+        :param translated_string: (string/code/tuple) the translation, together with the names of the modules to be
+        injected, in case the shell injects the modules
+        :return: (tuple) the packed code and the dict of the names, the modules are injected as, to their full names
+        """
+        if not self.shell.inject_modules:
+            return _pack_code(translated_string), {}
+        translated_string, module_names = translated_string
+        command_reference_dictionary = self.shell.shell_server.command_reference_dictionary
+        return _pack_code(translated_string), {name: module.__name__ for name, module in
+                                               command_reference_dictionary.resolve_modules(module_names).items()}
+
+    def _send_exception(self, exception):
+        """
+        Sends the exception to the worker, replacing it with a RuntimeError, in case it can not be pickled
+        :param exception: (Exception) the exception
+        :return: (void)
+        """
+        try:
+            self.connection.send((RAISE, exception))
+        except Exception:
+            self.connection.send((RAISE, RuntimeError("{}: {}".format(type(exception).__name__, exception))))
+
+    def _get_target(self, target):
+        """
+        :param target: (string) the name of the target object
+        :return: (object) the object of the shell, whose method is called by the worker process
+        """
+        if target == TARGET_ENV:
+            return self.shell.env_variable_container
+        if target == TARGET_COM:
+            return self.shell.fg_com
+        if target == TARGET_PROCESS_LIST:
+            return self.shell.process_list
+        if target == TARGET_COMMAND_REFERENCE:
+            return self.shell.shell_server.command_reference_dictionary
+        if target == TARGET_LATENCY_RECORDER:
+            return self.shell.latency_recorder
+        raise ValueError("Unknown target of the worker process: {}".format(target))
+
+    def _interrupt(self):
+        """
+        Interrupts the command running in the worker process. On POSIX systems the process receives SIGINT, which
+        raises KeyboardInterrupt within the command, even during blocking calls like 'time.sleep', and the end of the
+        command is waited for. In case it does not end in time, and on all the other systems, the process is replaced
+        :return: (void)
+        """
+        if os.name == "posix" and self.process.is_alive():
+            try:
+                os.kill(self.process.pid, signal.SIGINT)
+                deadline = time.perf_counter() + self.interrupt_timeout
+                while True:
+                    request = self._receive(max(deadline - time.perf_counter(), 0))
+                    if request is None:
+                        break
+                    if request[0] == FINISHED:
+                        return
+            except (OSError, EOFError, RuntimeError):
+                pass
+        self.restart()
+
+
+class _RemoteObject:
+    """
+    The proxy within the worker process for an object of the shell, forwarding all method calls through the channel
+
+    :ivar channel: (_Channel) the channel to the shell
+
+    :ivar target: (string) the name of the object
+    """
+    def __init__(self, channel, target):
+        self.channel = channel
+        self.target = target
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.channel.request((CALL, self.target, name, args, kwargs))
+
+    def __getitem__(self, key):
+        return self.channel.request((CALL, self.target, "__getitem__", (key,), {}))
+
+    def __setitem__(self, key, value):
+        self.channel.request((CALL, self.target, "__setitem__", (key, value), {}))
+
+    def __delitem__(self, key):
+        self.channel.request((CALL, self.target, "__delitem__", (key,), {}))
+
+    def __contains__(self, key):
+        return key in self.channel.request((CALL, self.target, "keys", (), {}))
+
+    def __len__(self):
+        return self.channel.request((CALL, self.target, "__len__", (), {}))
+
+
+class _Channel:
+    """
+    The worker side of the connection to the shell. As the command might use threads, every request is sent and
+    answered while holding the lock, so that the responses can not be mixed up
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.connection.send(message)
+
+    def request(self, message):
+        """
+        Sends the request and waits for the response of the shell
+        :param message: (tuple) the request
+        :return: (any) the returned value, in case the shell responded with an exception, it is raised
+        """
+        with self.lock:
+            self.connection.send(message)
+            kind, value = self.connection.recv()
+        if kind == RAISE:
+            raise value
+        return value
+
+
+class WorkerShellCom(datamanage.ShellCom):
+    """
+    The foreground ShellCom within the worker process, printing the messages through the channel to the shell and
+    accessing the environmental variables and the other objects of the shell by their proxies
+    """
+    def __init__(self, channel, project_path):
+        self.channel = channel
+        self.shell_server = None
+        self.project_path = project_path
+        self.env_variable_container = _RemoteObject(channel, TARGET_ENV)
+        self.process_list = _RemoteObject(channel, TARGET_PROCESS_LIST)
+        self.command_reference_dict = _RemoteObject(channel, TARGET_COMMAND_REFERENCE)
+        # the namespace of the command being executed, which is also used by the scripts it runs
+        self.namespace = None
+
+    def prompt_input(self, prompt, timeout=None, data_type=None):
+        return self.channel.request((PROMPT, prompt, timeout, data_type))
+
+    def run_script(self, file_path):
+        with open(file_path, "r") as file:
+            script_string = file.read()
+        packed_code, module_names = self.channel.request((TRANSLATE, script_string))
+        _execute(self, _unpack_code(packed_code), self.namespace, module_names)
+
+    def background(self, execution_statement):
+        self.channel.request((BACKGROUND, execution_statement))
+
+    def get_latency_recorder(self):
+        return _RemoteObject(self.channel, TARGET_LATENCY_RECORDER)
+
+    def stop_all(self):
+        self.channel.request((CALL, TARGET_COM, "stop_all", (), {}))
+
+    def keys(self):
+        return self.env_variable_container.keys()
+
+    def _print(self, msg):
+        self.channel.send((MESSAGE, msg))
+
+
+def _run_worker(connection, command_path, project_path, persistent_namespace):
+    """
+    The main loop of the worker process, executing one command after another, until the shell closes the connection.
+    A KeyboardInterrupt, caused by the shell cancelling the command, ends the running command
+    :param connection: (multiprocessing.connection.Connection) the worker side of the channel
+    :param command_path: (list) the search path of the command modules of the shell
+    :param project_path: (string) the path of the project directory
+    :param persistent_namespace: (boolean) whether the namespace is kept from one command to the next
+    :return: (void)
+    """
+    commands.extend_path(command_path)
+    channel = _Channel(connection)
+    fg_com = WorkerShellCom(channel, project_path)
+    code_cache = cacheutil.CodeCache()
+    namespace = None
+    version = None
+    while True:
+        try:
+            request = connection.recv()
+        except KeyboardInterrupt:
+            # the interruption came in after the command had already finished
+            continue
+        except (EOFError, OSError):
+            break
+
+        # responses to the requests of a cancelled command might still be left in the channel
+        if request[0] != EXECUTE:
+            continue
+        _, command_id, packed_code, module_names, command_version = request
+        timings = {}
+        try:
+            # after the commands have been changed or reloaded the modules are imported again, as soon as they are used
+            if command_version != version:
+                if version is not None:
+                    _forget_command_modules()
+                version = command_version
+            if namespace is None or not persistent_namespace:
+                namespace = _get_namespace(fg_com)
+                fg_com.namespace = namespace
+
+            start = time.perf_counter()
+            code = _unpack_code(packed_code)
+            if isinstance(code, str):
+                code = code_cache.compile(code)
+                timings[timingutil.STAGE_COMPILE] = time.perf_counter() - start
+            _execute(fg_com, code, namespace, module_names, timings)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            fg_com.print_error(e)
+        channel.send((FINISHED, timings))
+
+
+def _execute(fg_com, code, namespace, module_names, timings=None):
+    """
+    Executes the code within the namespace, printing a possible exception as error message. The command modules bound
+    by the execution are removed from the namespace at its end (see 'commands.remove_module_bindings')
+    :param fg_com: (WorkerShellCom) the ShellCom of the worker process
+    :param code: (code) the compiled code
+    :param namespace: (dict) the globals of the execution
+    :param module_names: (dict) the names of the command modules to be injected to their full names
+    :param timings: (dict) the dict, into which the duration of the 'exec' stage is written. None on default
+    :return: (void)
+    """
+    namespace.update(shell=fg_com, fg_com=fg_com, EnV=fg_com.env_variable_container,
+                     process_list=fg_com.process_list)
+    bound_names = commands.find_module_bindings(namespace)
+    try:
+        _inject_modules(namespace, module_names)
+        start = time.perf_counter()
+        try:
+            exec(code, namespace)
+        except Exception as e:
+            fg_com.print_error(e)
+        finally:
+            if timings is not None:
+                timings[timingutil.STAGE_EXEC] = time.perf_counter() - start
+    finally:
+        commands.remove_module_bindings(namespace, bound_names)
+
+
+def _inject_modules(namespace, module_names):
+    """
+    Imports the command modules, the translation has used instead of import statements, into the namespace
+    :param namespace: (dict) the globals of the execution
+    :param module_names: (dict) the names, the modules are injected as, to the full names of the modules
+    :return: (void)
+    """
+    namespace.update({name: importlib.import_module(module_name) for name, module_name in module_names.items()})
+
+
+def _get_namespace(fg_com):
+    """
+    :param fg_com: (WorkerShellCom) the ShellCom of the worker process
+    :return: (dict) the new namespace for the execution of the commands within the worker process, containing the names
+    the translation assumes to exist
+    """
+    return {"__builtins__": builtins, "__name__": "__main__", "background": _background, "shell": fg_com,
+            "fg_com": fg_com, "EnV": fg_com.env_variable_container, "process_list": fg_com.process_list}
+
+
+def _background(shell, execution_statement):
+    """
+    The replacement of the 'execute.background' function within the worker process, starting the background process
+    from the server, as it is the one managing the processes
+    :param shell: (WorkerShellCom) the ShellCom of the worker process
+    :param execution_statement: (string) the translated code of the background command
+    :return: (void)
+    """
+    shell.background(execution_statement)
+
+
+def _forget_command_modules():
+    """
+    Removes the imported command modules from the module cache of the worker process, so that changed modules are
+    imported again
+    :return: (void)
+    """
+    prefix = commands.__name__ + "."
+    for module_name in [module_name for module_name in sys.modules if module_name.startswith(prefix)]:
+        del sys.modules[module_name]
+
+
+def _pack_code(translated_string):
+    """
+    :param translated_string: (string/code) the translated code
+    :return: (tuple) the code in a form, that can be sent through the channel, as code objects can not be pickled
+    """
+    if isinstance(translated_string, types.CodeType):
+        return True, marshal.dumps(translated_string)
+    return False, translated_string
+
+
+def _unpack_code(packed_code):
+    """
+    :param packed_code: (tuple) the code as packed by '_pack_code'
+    :return: (string/code) the translated code
+    """
+    is_code, content = packed_code
+    return marshal.loads(content) if is_code else content
+
+
+def _get_transferable(value):
+    """
+    :param value: (any) the return value of a method of the shell
+    :return: (any) the value, with the views of dicts being replaced with lists and the read only mappings with dicts,
+    so that it can be pickled
+    """
+    if isinstance(value, (collections.abc.KeysView, collections.abc.ValuesView, collections.abc.ItemsView)):
+        return list(value)
+    if isinstance(value, types.MappingProxyType):
+        return dict(value)
+    return value